@@ -0,0 +1,154 @@
+import json
+import os
+import random
+
+import pytest
+from django.core.cache import cache
+
+pytest_plugins = [
+    'tests.fixtures.fixture_user',
+    'tests.fixtures.fixture_data',
+]
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks', 'Бенчмарки лент и записи')
+    group.addoption('--bench-users', type=int, default=50,
+                    help='Пользователей в наборе данных.')
+    group.addoption('--bench-groups', type=int, default=5,
+                    help='Групп в наборе данных.')
+    group.addoption('--bench-posts', type=int, default=500,
+                    help='Записей в наборе данных.')
+    group.addoption('--bench-follows', type=int, default=300,
+                    help='Подписок в наборе данных.')
+    group.addoption('--bench-comments', type=int, default=500,
+                    help='Комментариев в наборе данных.')
+    group.addoption('--bench-requests', type=int, default=200,
+                    help='Запросов на каждое измерение.')
+    group.addoption('--bench-writers', type=int, default=8,
+                    help='Параллельных писателей в бенчмарке записи.')
+    group.addoption('--bench-writes', type=int, default=200,
+                    help='Транзакций на одного писателя.')
+    group.addoption('--bench-threshold', type=float, default=0.5,
+                    help='Допустимое ухудшение относительно baseline.')
+    group.addoption('--bench-baseline', default=BASELINE_PATH,
+                    help='Файл baseline этой машины в формате JSON.')
+    group.addoption('--bench-save', action='store_true',
+                    help='Записать результаты в файл baseline.')
+
+
+@pytest.fixture(scope='session')
+def bench_options(request):
+    return {
+        name: request.config.getoption(f'bench_{name}')
+        for name in ('users', 'groups', 'posts', 'follows', 'comments',
+                     'requests', 'writers', 'writes', 'threshold',
+                     'baseline', 'save')
+    }
+
+
+@pytest.fixture(scope='session')
+def dataset(django_db_setup, django_db_blocker, bench_options):
+    """Набор данных для всех измерений сессии.
+
+    Строки создаются через mixer, как в фикстурах tests/, поэтому
+    сигналы заполняют счётчики, ленты подписок и поисковый индекс.
+    """
+    from mixer.backend.django import mixer
+
+    from posts.models import Comment, Follow, Group, Post, User
+
+    random.seed(0)
+    with django_db_blocker.unblock():
+        users = mixer.cycle(bench_options['users']).blend(User)
+        groups = mixer.cycle(bench_options['groups']).blend(Group)
+        count = bench_options['posts']
+        mixer.cycle(count).blend(
+            Post,
+            author=(random.choice(users) for _ in range(count)),
+            group=(random.choice(groups + [None]) for _ in range(count)),
+            image='',
+        )
+        pairs = [(user, author) for user in users for author in users
+                 if user != author]
+        for user, author in random.sample(
+            pairs, min(bench_options['follows'], len(pairs))
+        ):
+            Follow.objects.create(user=user, author=author)
+        posts = list(Post.objects.all())
+        count = bench_options['comments']
+        mixer.cycle(count).blend(
+            Comment,
+            post=(random.choice(posts) for _ in range(count)),
+            author=(random.choice(users) for _ in range(count)),
+        )
+        reader = max(users, key=lambda user: user.follower.count())
+        data = {
+            'reader': reader,
+            'group': max(groups, key=lambda group: group.posts.count()),
+            'author': max(users, key=lambda user: user.posts.count()),
+            'post': max(posts, key=lambda post: post.comments.count()),
+        }
+    cache.clear()
+    return data
+
+
+class Baseline:
+    """Результаты прошлых измерений на этой машине и сравнение с ними.
+
+    Абсолютные задержки зависят от машины, поэтому файл baseline не
+    хранится в репозитории: его создаёт и обновляет только --bench-save,
+    а без файла результаты лишь печатаются.
+    """
+
+    def __init__(self, path, threshold, save):
+        self.path = path
+        self.threshold = threshold
+        self.update = save
+        self.results = {}
+        try:
+            with open(path, encoding='utf-8') as baseline_file:
+                self.stored = json.load(baseline_file)
+        except FileNotFoundError:
+            self.stored = {}
+
+    def regressions(self, name, result):
+        """Метрики, которые ухудшились сильнее порога."""
+        self.results[name] = result
+        stored = self.stored.get(name)
+        # Квантили по разному числу запросов несравнимы.
+        if self.update or stored is None or (
+            stored['requests'] != result['requests']
+        ):
+            return []
+        limit = 1 + self.threshold
+        regressions = [
+            f'{metric}: {result[metric]:.2f} мс, было {stored[metric]:.2f} мс'
+            for metric in ('p50_ms', 'p95_ms')
+            if result[metric] > stored[metric] * limit
+        ]
+        if result['rps'] * limit < stored['rps']:
+            regressions.append(
+                f'rps: {result["rps"]:.1f}, было {stored["rps"]:.1f}'
+            )
+        return regressions
+
+    def save(self):
+        if not self.update:
+            return
+        with open(self.path, 'w', encoding='utf-8') as baseline_file:
+            json.dump({**self.stored, **self.results}, baseline_file,
+                      indent=2, sort_keys=True, ensure_ascii=False)
+            baseline_file.write('\n')
+
+
+@pytest.fixture(scope='session')
+def baseline(bench_options):
+    baseline = Baseline(
+        bench_options['baseline'], bench_options['threshold'],
+        bench_options['save']
+    )
+    yield baseline
+    baseline.save()
@@ -0,0 +1,48 @@
+"""Бенчмарк отрисовки карточек записей страницы ленты.
+
+Запуск: pytest benchmarks/test_cards.py. Перед каждым замером кеш
+очищается, поэтому отрисовываются все карточки страницы из 10 и 100
+записей; результат сравнивается с benchmarks/baseline.json этой машины.
+"""
+import statistics
+import time
+
+import pytest
+from django.core.cache import cache
+
+from core.templatetags.post_cards import post_cards
+
+PER_PAGE = (10, 100)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('per_page', PER_PAGE)
+def test_card_rendering(per_page, dataset, baseline, bench_options):
+    from posts.models import Post
+
+    posts = list(
+        Post.objects.select_related('author', 'group')[:per_page]
+    )
+    durations = []
+    started = time.perf_counter()
+    for _ in range(bench_options['requests']):
+        cache.clear()
+        start = time.perf_counter()
+        cards = post_cards(posts)
+        durations.append(time.perf_counter() - start)
+        assert len(cards) == len(posts)
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(durations, n=100)
+    result = {
+        'requests': bench_options['requests'],
+        'rps': round(bench_options['requests'] / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 3),
+        'p95_ms': round(quantiles[94] * 1000, 3),
+        'p99_ms': round(quantiles[98] * 1000, 3),
+    }
+    name = f'cards:{per_page}'
+    print(f'\n{name}: {result}')
+    regressions = baseline.regressions(name, result)
+    assert not regressions, (
+        f'{name} стала медленнее baseline: {"; ".join(regressions)}'
+    )
@@ -0,0 +1,133 @@
+"""Бенчмарки лент, страницы записи и JSON API.
+
+Запуск: pytest benchmarks [--bench-posts=5000 ...]. Каждая страница
+измеряется через тестовый клиент Django и напрямую через WSGI-приложение;
+результат сравнивается с benchmarks/baseline.json этой машины, если он
+есть, и тест падает, если p50, p95 или пропускная способность хуже
+сохранённых больше чем на --bench-threshold. --bench-save записывает
+новый baseline.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import Client
+from django.urls import reverse
+
+PAGES = {
+    'index': lambda data: reverse('posts:index'),
+    'group_list': lambda data: reverse(
+        'posts:group_list', kwargs={'slug': data['group'].slug}
+    ),
+    'profile': lambda data: reverse(
+        'posts:profile', kwargs={'username': data['author'].username}
+    ),
+    'post_detail': lambda data: reverse(
+        'posts:post_detail', kwargs={'post_id': data['post'].pk}
+    ),
+    'follow_index': lambda data: reverse('posts:follow_index'),
+    'api_index': lambda data: reverse('api:index'),
+    'api_group_posts': lambda data: reverse(
+        'api:group_posts', kwargs={'slug': data['group'].slug}
+    ),
+}
+
+
+@contextmanager
+def keep_connection():
+    # Как и тестовый клиент, не даём закрыть соединение на границах
+    # запроса: иначе оборвётся транзакция теста.
+    for signal in (request_started, request_finished):
+        signal.disconnect(close_old_connections)
+    try:
+        yield
+    finally:
+        for signal in (request_started, request_finished):
+            signal.connect(close_old_connections)
+
+
+class ClientDriver:
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+
+class WSGIDriver:
+    """Вызывает WSGI-приложение без тестового клиента и его сигналов."""
+
+    def __init__(self, user):
+        self.application = WSGIHandler()
+        client = Client()
+        client.force_login(user)
+        self.cookie = client.cookies.output(header='', sep=';').strip()
+
+    def get(self, path):
+        environ = {
+            'PATH_INFO': path,
+            'HTTP_HOST': 'testserver',
+            'HTTP_COOKIE': self.cookie,
+            'wsgi.input': BytesIO(),
+        }
+        setup_testing_defaults(environ)
+        status = []
+        with keep_connection():
+            response = self.application(
+                environ, lambda code, headers: status.append(code)
+            )
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+        return int(status[0].split()[0])
+
+
+DRIVERS = {'client': ClientDriver, 'wsgi': WSGIDriver}
+
+
+def measure(driver, path, requests):
+    durations = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        status = driver.get(path)
+        durations.append(time.perf_counter() - start)
+        assert status == 200, f'{path} ответил {status}'
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(durations, n=100)
+    return {
+        'requests': requests,
+        'rps': round(requests / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 3),
+        'p95_ms': round(quantiles[94] * 1000, 3),
+        'p99_ms': round(quantiles[98] * 1000, 3),
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('driver_name', DRIVERS)
+@pytest.mark.parametrize('page', PAGES)
+def test_page_performance(page, driver_name, dataset, baseline,
+                          bench_options, settings):
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    settings.REQUEST_METRICS_SAMPLE_RATE = 0
+    cache.clear()
+    driver = DRIVERS[driver_name](dataset['reader'])
+    path = PAGES[page](dataset)
+    driver.get(path)
+    result = measure(driver, path, bench_options['requests'])
+    name = f'{page}:{driver_name}:{settings.POSTS_PAGINATION}'
+    print(f'\n{name}: {result}')
+    regressions = baseline.regressions(name, result)
+    assert not regressions, (
+        f'{name} стала медленнее baseline: {"; ".join(regressions)}'
+    )
@@ -0,0 +1,147 @@
+"""Бенчмарк одновременной записи в SQLite.
+
+Запуск: pytest benchmarks/test_sqlite_writes.py [--bench-writers=16].
+Писатели в отдельных потоках повторяют транзакцию add_comment: читают
+запись, добавляют комментарий и увеличивают счётчик. Профиль default -
+настройки SQLite по умолчанию без повторов, tuned - SQLITE_PRAGMAS из
+settings и retry_on_locked. Для каждого профиля печатаются число
+успешных транзакций в секунду, задержки и число ошибок
+"database is locked"; с tuned ошибок быть не должно. С baseline
+результаты не сравниваются: задержки в доли миллисекунды слишком
+зависят от планировщика потоков.
+"""
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import pytest
+from django.db import OperationalError, connections, transaction
+
+from core.sqlite import is_locked, retry_on_locked
+
+ALIAS = 'bench_writes'
+POSTS = 100
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, comments_count INTEGER)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, '
+    'text TEXT)',
+)
+
+
+def add_comment(post_id, text):
+    with connections[ALIAS].cursor() as cursor:
+        cursor.execute('SELECT id FROM post WHERE id = %s', [post_id])
+        cursor.fetchone()
+        cursor.execute(
+            'INSERT INTO comment (post_id, text) VALUES (%s, %s)',
+            [post_id, text]
+        )
+        cursor.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = %s', [post_id]
+        )
+
+
+def without_retry(function):
+    def wrapper(*args):
+        with transaction.atomic(using=ALIAS):
+            return function(*args)
+    return wrapper
+
+
+PROFILES = {
+    'default': ({}, without_retry),
+    'tuned': (None, lambda function: retry_on_locked(function, using=ALIAS)),
+}
+
+
+@pytest.fixture
+def database(django_db_blocker):
+    handle, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(handle)
+    connections.databases[ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+    }
+    with django_db_blocker.unblock():
+        with connections[ALIAS].cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany(
+                'INSERT INTO post (id, comments_count) VALUES (%s, 0)',
+                [(pk,) for pk in range(1, POSTS + 1)]
+            )
+        connections[ALIAS].close()
+        yield
+    del connections[ALIAS]
+    del connections.databases[ALIAS]
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def run_writers(transaction_function, writers, writes):
+    durations, errors = [], []
+    lock = threading.Lock()
+
+    def writer(number):
+        local_durations, local_errors = [], 0
+        try:
+            for i in range(writes):
+                start = time.perf_counter()
+                try:
+                    transaction_function(
+                        (number * writes + i) % POSTS + 1, f'{number}:{i}'
+                    )
+                except OperationalError as error:
+                    if not is_locked(error):
+                        raise
+                    local_errors += 1
+                else:
+                    local_durations.append(time.perf_counter() - start)
+        finally:
+            connections[ALIAS].close()
+        with lock:
+            durations.extend(local_durations)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=writer, args=(number,))
+               for number in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return durations, sum(errors), time.perf_counter() - started
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_concurrent_writes(profile, database, bench_options, settings):
+    pragmas, wrap = PROFILES[profile]
+    if pragmas is not None:
+        settings.SQLITE_PRAGMAS = pragmas
+    durations, errors, elapsed = run_writers(
+        wrap(add_comment), bench_options['writers'], bench_options['writes']
+    )
+    with connections[ALIAS].cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM comment')
+        comments = cursor.fetchone()[0]
+        cursor.execute('SELECT SUM(comments_count) FROM post')
+        counted = cursor.fetchone()[0]
+    connections[ALIAS].close()
+    assert comments == counted == len(durations)
+    quantiles = statistics.quantiles(durations, n=100)
+    result = {
+        'requests': len(durations),
+        'errors': errors,
+        'rps': round(len(durations) / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 3),
+        'p95_ms': round(quantiles[94] * 1000, 3),
+        'p99_ms': round(quantiles[98] * 1000, 3),
+    }
+    name = f'writes:{profile}:{bench_options["writers"]}'
+    print(f'\n{name}: {result}')
+    if profile == 'tuned':
+        assert not errors, f'{errors} транзакций не дождались блокировки'
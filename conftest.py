@@ -0,0 +1,6 @@
+def pytest_configure(config):
+    from django.conf import settings
+
+    # Автотесты удаляют временный MEDIA_ROOT сразу после теста, а потоки
+    # миниатюр могли бы писать в него и после ответа.
+    settings.THUMBNAIL_WORKERS = 0
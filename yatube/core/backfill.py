@@ -0,0 +1,139 @@
+"""Пакетный пересчёт производных данных с продолжением после сбоя.
+
+Задача пересчёта - подкласс Backfill, зарегистрированный через register в
+модуле backfills.py приложения. Таблица обходится кусками по первичному
+ключу: границы куска выбираются отдельным коротким запросом, кусок
+обрабатывается и фиксируется в своей транзакции, после чего в
+BackfillCheckpoint записывается последний обработанный id. Куски можно
+раздать пулу процессов; отметка тогда двигается только по непрерывному
+префиксу готовых кусков, поэтому после сбоя ничего не пропускается.
+Отметка законченного пересчёта удаляется, и следующий запуск снова
+проходит всю таблицу.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.db import connections, transaction
+from django.utils.module_loading import autodiscover_modules
+
+from .models import BackfillCheckpoint
+from .sqlite import retry_on_locked
+
+registry = {}
+
+
+def register(backfill_class):
+    registry[backfill_class.name] = backfill_class
+    return backfill_class
+
+
+def autodiscover():
+    autodiscover_modules('backfills')
+
+
+class Backfill:
+    """Базовый класс задачи пересчёта по строкам модели model."""
+    name = None
+    model = None
+    batch_size = 1000
+    chunk_size = 500
+
+    def get_queryset(self):
+        return apps.get_model(self.model)._default_manager.order_by('pk')
+
+    def process(self, queryset):
+        """Пересчитывает строки одного куска."""
+        raise NotImplementedError
+
+
+def chunks(queryset, batch_size, after=0):
+    """Границы кусков (первый id, последний id, число строк) после after."""
+    while True:
+        pks = list(queryset.filter(pk__gt=after).values_list(
+            'pk', flat=True
+        )[:batch_size])
+        if not pks:
+            return
+        yield pks[0], pks[-1], len(pks)
+        after = pks[-1]
+
+
+def run_chunk(name, first, last):
+    # SQLite пускает одного писателя: кусок откатывается целиком,
+    # и его можно повторить, когда другой процесс закончит.
+    backfill = registry[name]()
+    retry_on_locked(backfill.process)(
+        backfill.get_queryset().filter(pk__gte=first, pk__lte=last)
+    )
+
+
+def _init_worker():
+    # Соединения родителя нельзя использовать в дочернем процессе.
+    connections.close_all()
+    autodiscover()
+
+
+class Runner:
+    """Выполняет задачу пересчёта и сообщает о ходе через report."""
+
+    def __init__(self, name, batch_size=None, workers=1, report=None):
+        self.backfill = registry[name]()
+        self.name = name
+        self.batch_size = batch_size or self.backfill.batch_size
+        self.workers = workers
+        self.report = report or (lambda *args: None)
+
+    def checkpoint(self):
+        return BackfillCheckpoint.objects.get_or_create(name=self.name)[0]
+
+    def reset(self):
+        BackfillCheckpoint.objects.filter(name=self.name).delete()
+
+    def run(self):
+        checkpoint = self.checkpoint()
+        queryset = self.backfill.get_queryset()
+        total = queryset.filter(pk__gt=checkpoint.last_pk).count()
+        self.started = time.monotonic()
+        self.done = 0
+        batches = chunks(queryset, self.batch_size, checkpoint.last_pk)
+        if self.workers > 1:
+            self.run_parallel(batches, checkpoint, total)
+        else:
+            for first, last, count in batches:
+                with transaction.atomic():
+                    self.backfill.process(
+                        queryset.filter(pk__gte=first, pk__lte=last)
+                    )
+                    self.advance(checkpoint, last, count, total)
+        self.reset()
+        return self.done
+
+    def run_parallel(self, batches, checkpoint, total):
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker
+        ) as pool:
+            pending = []
+            for first, last, count in batches:
+                pending.append((
+                    pool.submit(run_chunk, self.name, first, last),
+                    last, count
+                ))
+                # Не больше двух кусков в очереди на процесс.
+                while len(pending) >= self.workers * 2 or (
+                    pending and pending[0][0].done()
+                ):
+                    future, last, count = pending.pop(0)
+                    future.result()
+                    self.advance(checkpoint, last, count, total)
+            for future, last, count in pending:
+                future.result()
+                self.advance(checkpoint, last, count, total)
+
+    def advance(self, checkpoint, last, count, total):
+        checkpoint.last_pk = last
+        checkpoint.save(update_fields=['last_pk', 'updated'])
+        self.done += count
+        elapsed = time.monotonic() - self.started
+        self.report(self.done, total, self.done / elapsed if elapsed else 0)
@@ -0,0 +1,63 @@
+"""Кеширование с защитой от лавины пересчётов (cache stampede).
+
+get_or_set хранит рядом со значением время его вычисления и срок жизни.
+Незадолго до истечения срока значение с растущей вероятностью
+пересчитывается заранее (probabilistic early expiry), а пересчёт
+выполняет только процесс, получивший блокировку через cache.add;
+остальные отдают прежнее значение или ждут нового.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+from .metrics import count_cache
+
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_or_set(key, compute, timeout, beta=1.0):
+    """Возвращает значение из кеша, вычисляя его не более одного раза
+    на все конкурирующие запросы."""
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        early = delta * beta * math.log(1 - random.random())
+        if time.time() - early < expires:
+            count_cache(hits=1)
+            return value
+    count_cache(misses=1)
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, True, LOCK_TIMEOUT):
+        try:
+            start = time.time()
+            value = compute()
+            delta = time.time() - start
+            cache.set(key, (value, delta, time.time() + timeout), timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        return entry[0]
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return compute()
+
+
+def get_version(name):
+    """Текущая версия набора ключей name."""
+    return cache.get_or_set(f'version:{name}', time.time_ns(), None)
+
+
+def bump_version(name):
+    """Делает все ключи с прежней версией name недоступными."""
+    try:
+        cache.incr(f'version:{name}')
+    except ValueError:
+        cache.set(f'version:{name}', time.time_ns(), None)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(deploy=True)
+def shared_cache(app_configs, **kwargs):
+    """Сброс версий лент и подписок должен доходить до всех процессов."""
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'Кеш {backend} виден только своему процессу: другие процессы '
+        'будут отдавать устаревшие ленты и подписки.',
+        hint='Задайте CACHE_BACKEND=memcached или file.',
+        id='core.W001',
+    )]
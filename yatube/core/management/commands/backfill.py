@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает производные данные кусками по id. Прерванный '
+        'пересчёт продолжается с последнего готового куска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help='Задачи пересчёта; без имён печатает их список.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Строк в одном куске и одной транзакции.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Процессов для обработки кусков.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с начала таблицы, забыв отметку.'
+        )
+
+    def handle(self, *args, **options):
+        backfill.autodiscover()
+        if not options['names']:
+            for name, backfill_class in sorted(backfill.registry.items()):
+                self.stdout.write(f'{name}: {backfill_class.__doc__}')
+            return
+        unknown = set(options['names']) - set(backfill.registry)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные задачи: {", ".join(sorted(unknown))}'
+            )
+        for name in options['names']:
+            runner = backfill.Runner(
+                name, options['batch_size'], options['workers'],
+                report=self.progress(name)
+            )
+            if options['restart']:
+                runner.reset()
+            done = runner.run()
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: обработано строк {done}.'
+            ))
+
+    def progress(self, name):
+        def report(done, total, rate):
+            self.stdout.write(
+                f'{name}: {done} из {total} ({rate:.0f} строк/с)'
+            )
+        return report
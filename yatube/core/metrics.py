@@ -0,0 +1,84 @@
+"""Метрики обработки запроса.
+
+Пока запрос обрабатывается, его метрики лежат в локальной для потока
+переменной: их пополняют обёртка выполнения SQL, шаблонный бэкенд и
+функции кеша. Длительности запросов копятся в скользящем окне по имени
+представления, по которому считаются перцентили.
+"""
+import threading
+from collections import defaultdict, deque
+
+WINDOW = 1000
+PERCENTILES = (50, 95, 99)
+
+_local = threading.local()
+_windows = defaultdict(lambda: deque(maxlen=WINDOW))
+_windows_lock = threading.Lock()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.templates = {}
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def stop():
+    _local.metrics = None
+
+
+def current():
+    """Метрики текущего запроса или None, если запрос не измеряется."""
+    return getattr(_local, 'metrics', None)
+
+
+def count_cache(hits=0, misses=0):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def record_template(request_metrics, name, duration):
+    """Добавляет отрисовку шаблона name: число отрисовок и время."""
+    renders, total = request_metrics.templates.get(name, (0, 0.0))
+    request_metrics.templates[name] = (renders + 1, total + duration)
+
+
+def record_duration(view_name, duration):
+    with _windows_lock:
+        _windows[view_name].append(duration)
+
+
+def percentiles(view_name):
+    """Перцентили длительности запросов представления за окно, в секундах."""
+    with _windows_lock:
+        durations = sorted(_windows.get(view_name, ()))
+    if not durations:
+        return {}
+    return {
+        f'p{rank}': durations[min(len(durations) - 1,
+                                  len(durations) * rank // 100)]
+        for rank in PERCENTILES
+    }
+
+
+def summary():
+    """Перцентили всех представлений, по которым есть измерения."""
+    with _windows_lock:
+        names = list(_windows)
+    return {name: percentiles(name) for name in names}
+
+
+def reset():
+    with _windows_lock:
+        _windows.clear()
@@ -0,0 +1,126 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, replicas
+
+logger = logging.getLogger('core.requests')
+
+
+def _timed_execute(execute, sql, params, many, context):
+    request_metrics = metrics.current()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if request_metrics is not None:
+            request_metrics.queries += 1
+            request_metrics.sql_time += time.perf_counter() - start
+
+
+class RequestMetricsMiddleware:
+    """Измеряет выборку запросов: число и время SQL, время отрисовки
+    шаблонов и обращения к кешу.
+
+    Метрики отдаются заголовком Server-Timing и строкой JSON в журнал
+    core.requests. Доля измеряемых запросов задаётся
+    REQUEST_METRICS_SAMPLE_RATE, остальные проходят без накладных расходов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        request_metrics = metrics.start()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_timed_execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        metrics.record_duration(view_name, duration)
+        response['Server-Timing'] = self.server_timing(
+            request_metrics, duration
+        )
+        entry = {
+            'view': view_name,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': request_metrics.queries,
+            'sql_ms': round(request_metrics.sql_time * 1000, 2),
+            'template_ms': round(request_metrics.template_time * 1000, 2),
+            'cache_hits': request_metrics.cache_hits,
+            'cache_misses': request_metrics.cache_misses,
+            **{
+                f'{name}_ms': round(value * 1000, 2)
+                for name, value in metrics.percentiles(view_name).items()
+            },
+        }
+        if request_metrics.templates:
+            entry['templates'] = {
+                name: {'renders': renders, 'ms': round(total * 1000, 2)}
+                for name, (renders, total) in request_metrics.templates.items()
+            }
+        logger.info(json.dumps(entry, ensure_ascii=False))
+        return response
+
+    @staticmethod
+    def server_timing(request_metrics, duration):
+        return ', '.join((
+            f'sql;dur={request_metrics.sql_time * 1000:.2f};'
+            f'desc="{request_metrics.queries} queries"',
+            f'tpl;dur={request_metrics.template_time * 1000:.2f}',
+            *(
+                f'tpl-{number};dur={total * 1000:.2f};'
+                f'desc="{name} x{renders}"'
+                for number, (name, (renders, total)) in enumerate(
+                    request_metrics.templates.items(), 1
+                )
+            ),
+            f'cache;desc="{request_metrics.cache_hits} hits, '
+            f'{request_metrics.cache_misses} misses"',
+            f'total;dur={duration * 1000:.2f}',
+        ))
+
+
+class ReplicaMiddleware:
+    """Направляет чтение представлений read_replica на реплики
+    и закрепляет клиента за основной базой после его записей."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = replicas.end()
+        if wrote:
+            response.set_cookie(
+                replicas.STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas.route_reads(
+            getattr(view_func, 'read_replica', False)
+            and request.method in ('GET', 'HEAD')
+            and replicas.STICKY_COOKIE not in request.COOKIES
+        )
@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class BackfillCheckpoint(models.Model):
+    """Класс отметки, до которой дошёл пересчёт."""
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Пересчёт')
+    last_pk = models.BigIntegerField(
+        default=0,
+        verbose_name='Последний обработанный id')
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения')
+
+    def __str__(self):
+        return f'{self.name}: {self.last_pk}'
+
+    class Meta:
+        verbose_name = 'Отметка пересчёта'
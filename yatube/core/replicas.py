@@ -0,0 +1,94 @@
+"""Чтение лент с реплик базы.
+
+Представления, помеченные read_replica, читают модели приложений
+REPLICA_APPS с одной из баз DATABASE_REPLICAS; сессии, пользователи и
+любые записи идут в default. Если за запрос что-то записано в базу,
+ReplicaMiddleware ставит cookie, и следующие REPLICA_STICKY_SECONDS
+запросы этого клиента читают с основной базы, чтобы он видел свои
+изменения, пока реплики их догоняют.
+
+Готовые страницы лент кешируются по версии ленты, поэтому страница,
+прочитанная с отстающей реплики, может продержаться в кеше до
+FEED_CACHE_TIMEOUT.
+"""
+import random
+import sqlite3
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_APPS = {'posts'}
+STICKY_COOKIE = 'read_primary'
+
+_local = threading.local()
+
+
+def read_replica(view):
+    """Отмечает представление, которое может читать с реплики."""
+    @wraps(view)
+    def wrapped_view(*args, **kwargs):
+        return view(*args, **kwargs)
+    wrapped_view.read_replica = True
+    return wrapped_view
+
+
+def begin():
+    _local.use_replica = False
+    _local.wrote = False
+
+
+def route_reads(use_replica):
+    _local.use_replica = use_replica
+
+
+def end():
+    """Сбрасывает состояние запроса и сообщает, была ли в нём запись."""
+    wrote = getattr(_local, 'wrote', False)
+    begin()
+    return wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            getattr(_local, 'use_replica', False)
+            and settings.DATABASE_REPLICAS
+            and model._meta.app_label in REPLICA_APPS
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема попадает на реплики вместе с данными основной базы.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def sync_replicas(aliases=None):
+    """Копирует основную базу SQLite в реплики.
+
+    Заменяет настоящую репликацию при локальной проверке и в тестах.
+    """
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    for alias in aliases or settings.DATABASE_REPLICAS:
+        replica = connections[alias]
+        replica.close()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
@@ -0,0 +1,56 @@
+"""Настройка SQLite под одновременных писателей.
+
+Каждое новое соединение получает SQLITE_PRAGMAS: журнал WAL не
+блокирует читателей на время записи, synchronous=NORMAL сбрасывает
+журнал на диск только при контрольных точках, busy_timeout заставляет
+писателя ждать блокировку, а не падать сразу. Остаются взаимные
+блокировки транзакций, которые сначала читают, а потом пишут: SQLite
+отвечает на них "database is locked" без ожидания, и такие транзакции
+повторяет retry_on_locked.
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+LOCKED_RETRIES = 10
+BACKOFF = 0.01
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def retry_on_locked(function=None, retries=LOCKED_RETRIES, using=None):
+    """Выполняет function в транзакции и повторяет её со случайной
+    экспоненциальной задержкой, пока база занята другим писателем.
+
+    Транзакция откатывается целиком, поэтому повтор безопасен, если
+    у function нет побочных эффектов вне базы.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            for attempt in range(retries):
+                try:
+                    with transaction.atomic(using=using):
+                        return function(*args, **kwargs)
+                except OperationalError as error:
+                    if not is_locked(error) or attempt == retries - 1:
+                        raise
+                time.sleep(random.uniform(0, BACKOFF * 2 ** attempt))
+        return wrapper
+    return decorator(function) if function else decorator
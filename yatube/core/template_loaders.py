@@ -0,0 +1,105 @@
+"""Загрузка шаблонов: замер отрисовки каждого шаблона и прогрев кеша.
+
+ProfilingLoader оборачивает шаблоны вложенных загрузчиков так, что
+каждая отрисовка, в том числе через {% include %} и render_to_string,
+добавляет своё время к метрикам запроса под именем шаблона. Время
+включает вложенные шаблоны. Загрузчик подключается только в DEBUG.
+
+warm_up компилирует все шаблоны из DIRS при старте процесса, чтобы
+cached.Loader не разбирал их на первых запросах.
+"""
+import logging
+import os
+import time
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.base import Loader
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ProfiledTemplate:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context):
+        request_metrics = metrics.current()
+        if request_metrics is None:
+            return self._template.render(context)
+        start = time.perf_counter()
+        try:
+            return self._template.render(context)
+        finally:
+            metrics.record_template(
+                request_metrics, self._template.origin.template_name,
+                time.perf_counter() - start
+            )
+
+
+class ProfilingLoader(Loader):
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_template(self, template_name, skip=None):
+        tried = []
+        for loader in self.loaders:
+            try:
+                template = loader.get_template(template_name, skip=skip)
+            except TemplateDoesNotExist as error:
+                tried.extend(error.tried)
+            else:
+                return ProfiledTemplate(template)
+        raise TemplateDoesNotExist(template_name, tried=tried)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            yield from loader.get_template_sources(template_name)
+
+    def reset(self):
+        for loader in self.loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+
+
+def template_names(engine):
+    """Имена всех шаблонов в каталогах DIRS движка."""
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for file_name in files:
+                yield os.path.relpath(
+                    os.path.join(root, file_name), directory
+                ).replace(os.sep, '/')
+
+
+def warm_up(engine=None):
+    """Компилирует шаблоны из DIRS и возвращает имена скомпилированных."""
+    if engine is None:
+        engine_list = [
+            backend.engine for backend in engines.all()
+            if isinstance(backend, DjangoTemplates)
+        ]
+    else:
+        engine_list = [engine]
+    start = time.perf_counter()
+    compiled = []
+    for template_engine in engine_list:
+        for name in template_names(template_engine):
+            try:
+                template_engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception('Шаблон %s не компилируется', name)
+            else:
+                compiled.append(name)
+    logger.info(
+        'Скомпилировано шаблонов: %s за %.1f мс',
+        len(compiled), (time.perf_counter() - start) * 1000
+    )
+    return compiled
@@ -0,0 +1,35 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+def page_window(number, num_pages, on_each_side, on_ends=1):
+    """Номера страниц для навигации: on_ends первых и последних
+    и on_each_side вокруг текущей, пропуски между ними - None.
+
+    Длина списка не зависит от числа страниц.
+    """
+    if num_pages <= 2 * (on_each_side + on_ends + 1) + 1:
+        return list(range(1, num_pages + 1))
+    start = max(number - on_each_side, 1)
+    stop = min(number + on_each_side, num_pages)
+    # Пропуск длиной в одну страницу не короче её номера.
+    if start <= on_ends + 2:
+        start = 1
+    if stop >= num_pages - on_ends - 1:
+        stop = num_pages
+    pages = list(range(start, stop + 1))
+    if start > 1:
+        pages[:0] = list(range(1, on_ends + 1)) + [None]
+    if stop < num_pages:
+        pages += [None] + list(range(num_pages - on_ends + 1, num_pages + 1))
+    return pages
+
+
+@register.simple_tag
+def page_range(page, on_each_side=None):
+    """Окно номеров страниц вокруг текущей страницы page."""
+    if on_each_side is None:
+        on_each_side = settings.PAGINATOR_ON_EACH_SIDE
+    return page_window(page.number, page.paginator.num_pages, on_each_side)
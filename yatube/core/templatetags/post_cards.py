@@ -0,0 +1,106 @@
+from hashlib import md5
+from urllib.parse import quote
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.defaultfilters import date
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+from django.utils.timezone import template_localtime
+
+from core.metrics import count_cache
+from posts import thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_card.html'
+URL_MARKER = '1234567890'
+URL_SAFE = "!$&'()*+,;=/~:@"
+
+
+def url_pattern(view_name):
+    """Адрес представления с одним аргументом как функция аргумента.
+
+    reverse вызывается один раз, а адреса карточек собираются
+    подстановкой аргумента между префиксом и суффиксом.
+    """
+    prefix, suffix = reverse(view_name, args=[URL_MARKER]).split(URL_MARKER)
+    return lambda value: f'{prefix}{quote(str(value), safe=URL_SAFE)}{suffix}'
+
+
+def card_fields(posts, show_author, show_group):
+    """Всё, что показывает карточка, посчитанное заранее для страницы."""
+    profile_url = url_pattern('posts:profile')
+    detail_url = url_pattern('posts:post_detail')
+    group_url = url_pattern('posts:group_list')
+    for post in posts:
+        card = {
+            'text': post.text,
+            'pub_date': date(template_localtime(post.pub_date), 'd E Y'),
+            'url': detail_url(post.pk),
+            'image': thumbnails.image_for(post),
+        }
+        if show_author:
+            card['author_name'] = post.author.get_full_name()
+            card['author_url'] = profile_url(post.author.username)
+        if show_group and post.group_id:
+            card['group_title'] = post.group.title
+            card['group_url'] = group_url(post.group.slug)
+        yield card
+
+
+def render_cards(posts, show_author, show_group):
+    """Отрисовывает карточки записей за один проход.
+
+    Шаблон карточки компилируется и контекст создаётся один раз на
+    страницу, а адреса и подписи берутся из card_fields.
+    """
+    card_template = get_template(CARD_TEMPLATE).template
+    context = template.Context({
+        'show_author': show_author, 'show_group': show_group,
+    })
+    cards = []
+    for card in card_fields(posts, show_author, show_group):
+        with context.push(card=card):
+            cards.append(card_template.render(context))
+    return cards
+
+
+def card_key(post, show_author, show_group):
+    """Ключ карточки меняется вместе с любыми показанными в ней данными,
+    поэтому устаревшие карточки не нужно удалять из кеша."""
+    version = [post.updated.isoformat(), show_author, show_group]
+    if show_author:
+        version += [post.author.username, post.author.get_full_name()]
+    if show_group and post.group_id:
+        version += [post.group.slug, post.group.title]
+    digest = md5('|'.join(map(str, version)).encode()).hexdigest()
+    return f'post_card:{post.pk}:{digest}'
+
+
+@register.simple_tag
+def post_cards(posts, show_author=True, show_group=True):
+    """Возвращает карточки записей страницы ленты.
+
+    Карточки читаются из кеша одним get_many, а отрисовываются
+    и кладутся в кеш только отсутствующие.
+    """
+    keys = {card_key(post, show_author, show_group): post for post in posts}
+    cards = cache.get_many(keys)
+    missing_keys = [key for key in keys if key not in cards]
+    missing = dict(zip(missing_keys, render_cards(
+        [keys[key] for key in missing_keys], show_author, show_group
+    )))
+    count_cache(hits=len(cards), misses=len(missing))
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+@register.filter
+def post_image(post):
+    """Готовая миниатюра картинки записи или, пока её нет, оригинал."""
+    return thumbnails.image_for(post)
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import bump_version, get_or_set, get_version
+from core.checks import shared_cache
+
+
+class GetOrSetTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_value_is_cached(self):
+        """Проверяем, что значение вычисляется один раз."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'значение'
+
+        for _ in range(3):
+            self.assertEqual(get_or_set('key', compute, 60), 'значение')
+        self.assertEqual(len(calls), 1)
+
+    def test_cold_key_computed_once(self):
+        """Проверяем, что конкурирующие запросы холодного ключа
+        вызывают одно вычисление."""
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'значение'
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(get_or_set('key', compute, 60))
+            )
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['значение'] * 10)
+
+    def test_early_expiry(self):
+        """Проверяем, что дорогое значение пересчитывается
+        до истечения срока жизни."""
+        cache.set('key', ('старое', 10.0, time.time() + 1), 60)
+        self.assertEqual(
+            get_or_set('key', lambda: 'новое', 60, beta=1000), 'новое'
+        )
+
+    def test_bump_version(self):
+        """Проверяем, что версия меняется."""
+        version = get_version('feed')
+        bump_version('feed')
+        self.assertNotEqual(get_version('feed'), version)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_process_local_cache_in_production(self):
+        """Проверяем, что без DEBUG кеш в памяти процесса вызывает
+        предупреждение, а общий кеш - нет."""
+        for backend, warnings in [
+            ('django.core.cache.backends.locmem.LocMemCache', ['core.W001']),
+            ('django.core.cache.backends.memcached.MemcachedCache', []),
+        ]:
+            with self.subTest(backend=backend), override_settings(
+                DEBUG=False, CACHES={'default': {'BACKEND': backend}}
+            ):
+                self.assertEqual(
+                    [warning.id for warning in shared_cache(None)], warnings
+                )
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post, User
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0)
+class RequestMetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='testAuthor')
+        Post.objects.create(author=cls.author, text='Тест-пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_server_timing(self):
+        """Проверяем, что в ответе есть заголовок Server-Timing
+        с числом запросов к базе и обращениями к кешу."""
+        with self.assertLogs('core.requests') as logs:
+            response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for metric in ('sql;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            self.assertIn(metric, header)
+        self.assertIn('"posts:index"', logs.output[0])
+        self.assertIn('"queries": 2', logs.output[0])
+        self.assertIn('"cache_misses": 2', logs.output[0])
+
+    def test_percentiles(self):
+        """Проверяем, что длительности копятся по имени представления."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            set(metrics.percentiles('posts:index')), {'p50', 'p95', 'p99'}
+        )
+        self.assertEqual(metrics.percentiles('posts:profile'), {})
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        """Проверяем, что без выборки метрики не собираются."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(metrics.summary(), {})
@@ -0,0 +1,93 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.replicas import STICKY_COOKIE, ReplicaRouter, sync_replicas
+from posts.models import Post, Profile, User
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Реплика - отдельный файл SQLite, который догоняет основную
+    базу только при вызове sync_replicas."""
+
+    def setUp(self):
+        cache.clear()
+        handle, self.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': self.replica_path,
+        }
+        self.author = User.objects.create_user(username='testAuthor')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.post = Post.objects.create(author=self.author, text='Старый пост')
+        sync_replicas()
+
+    def tearDown(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        os.remove(self.replica_path)
+
+    def index_posts(self, client):
+        cache.clear()
+        return list(client.get(reverse('posts:index')).context['page_obj'])
+
+    def test_reads_from_replica(self):
+        """Проверяем, что ленты читаются с реплики и видят новые
+        записи только после её обновления."""
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.index_posts(self.client), [self.post])
+        sync_replicas()
+        self.assertEqual(
+            self.index_posts(self.client), [new_post, self.post]
+        )
+
+    def test_read_your_writes(self):
+        """Проверяем, что после записи клиент читает с основной базы,
+        а остальные - с реплики."""
+        response = self.author_client.post(
+            reverse('posts:post_create'), data={'text': 'Свой пост'}
+        )
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(
+            response.cookies[STICKY_COOKIE]['max-age'],
+            settings.REPLICA_STICKY_SECONDS
+        )
+        new_post = Post.objects.get(text='Свой пост')
+        self.assertIn(new_post, self.index_posts(self.author_client))
+        self.assertNotIn(new_post, self.index_posts(self.client))
+        post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': new_post.pk}
+        )
+        self.assertEqual(self.author_client.get(post_url).status_code, 200)
+        self.assertEqual(self.client.get(post_url).status_code, 404)
+
+    def test_missing_profile_on_replica(self):
+        """Проверяем, что профиль, созданный при чтении страницы автора
+        с реплики, читается из основной базы."""
+        Profile.objects.filter(user=self.author).delete()
+        sync_replicas()
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['author_profile'].posts_count, 1)
+
+    def test_router(self):
+        """Проверяем, что без пометки представления чтение и любая
+        запись идут в основную базу, а на реплики не мигрируют."""
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Post))
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertFalse(router.allow_migrate(REPLICA, 'posts'))
+        self.assertIsNone(router.allow_migrate('default', 'posts'))
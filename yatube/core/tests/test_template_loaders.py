@@ -0,0 +1,86 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.backends.django import DjangoTemplates
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from core.template_loaders import warm_up
+from posts.models import Post, User
+
+CARD_TEMPLATE = 'includes/post_card.html'
+
+
+@override_settings(
+    REQUEST_METRICS_SAMPLE_RATE=1.0,
+    TEMPLATES=[{
+        **settings.TEMPLATES[0],
+        'OPTIONS': {
+            **settings.TEMPLATES[0]['OPTIONS'],
+            'loaders': [(
+                'core.template_loaders.ProfilingLoader',
+                settings.TEMPLATE_LOADERS
+            )],
+        },
+    }],
+)
+class TemplateProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='testAuthor')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Тест-пост {i}')
+            for i in range(settings.POSTS_PER_PAGE)
+        )
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_include_timings(self):
+        """Проверяем, что время каждого шаблона страницы попадает
+        в журнал и Server-Timing вместе с числом отрисовок."""
+        with self.assertLogs('core.requests') as logs:
+            response = self.client.get(reverse('posts:index'))
+        templates = json.loads(
+            logs.records[0].getMessage()
+        )['templates']
+        self.assertEqual(templates[CARD_TEMPLATE]['renders'],
+                         settings.POSTS_PER_PAGE)
+        for name in ('posts/index.html', 'includes/header.html'):
+            self.assertIn(name, templates)
+        self.assertIn(f'desc="{CARD_TEMPLATE} x{settings.POSTS_PER_PAGE}"',
+                      response['Server-Timing'])
+
+    def test_cached_cards_not_rendered(self):
+        """Проверяем, что карточки из кеша не отрисовываются заново."""
+        self.client.get(reverse('posts:index'))
+        with self.assertLogs('core.requests') as logs:
+            self.client.get(reverse('posts:index'))
+        templates = json.loads(
+            logs.records[0].getMessage()
+        )['templates']
+        self.assertNotIn(CARD_TEMPLATE, templates)
+
+
+class WarmUpTests(TestCase):
+    def test_warm_up_fills_cached_loader(self):
+        """Проверяем, что прогрев компилирует все шаблоны из DIRS."""
+        backend = DjangoTemplates({
+            'NAME': 'warm_up',
+            'DIRS': [settings.TEMPLATES_DIR],
+            'APP_DIRS': False,
+            'OPTIONS': {'loaders': [(
+                'django.template.loaders.cached.Loader',
+                ['django.template.loaders.filesystem.Loader'],
+            )]},
+        })
+        compiled = warm_up(backend.engine)
+        for name in ('base.html', 'posts/index.html', CARD_TEMPLATE):
+            self.assertIn(name, compiled)
+        cached_loader = backend.engine.template_loaders[0]
+        self.assertEqual(
+            set(compiled), set(cached_loader.get_template_cache)
+        )
@@ -0,0 +1,33 @@
+from django.test import SimpleTestCase
+
+from core.text import hashtags, normalize, stem, terms
+
+
+class TextTests(SimpleTestCase):
+    def test_normalize(self):
+        """Проверяем приведение к нижнему регистру и замену ё."""
+        self.assertEqual(normalize('ЁЖИК Ёлка'), 'ежик елка')
+
+    def test_stem(self):
+        """Проверяем, что словоформы сводятся к одной основе."""
+        cases = (
+            ('книга', 'книги', 'книгами', 'книгой'),
+            ('красивый', 'красивая', 'красивейший'),
+            ('заблудился', 'заблудилась'),
+            ('длинный', 'длинная'),
+        )
+        for base, *forms in cases:
+            for word in forms:
+                with self.subTest(word=word):
+                    self.assertEqual(stem(word), stem(base))
+
+    def test_terms_skip_stop_words(self):
+        """Проверяем, что стоп-слова не попадают в индекс."""
+        self.assertEqual(terms('Ёжик и я в тумане'), ['ежик', 'туман'])
+
+    def test_hashtags(self):
+        """Проверяем разбор хештегов."""
+        self.assertEqual(
+            hashtags('#Ёжик в #тумане, почта a#b и снова #ёжик'),
+            ['ежик', 'тумане']
+        )
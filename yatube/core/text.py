@@ -0,0 +1,111 @@
+"""Разбор русского текста для поиска и хештегов.
+
+Текст приводится к нижнему регистру с заменой ё на е, делится на слова
+скомпилированными регулярными выражениями, стоп-слова отбрасываются,
+а остальные слова сводятся к основе стеммером Snowball для русского
+языка. Основы кешируются: словарь живого текста невелик, поэтому
+переиндексация почти не тратит время на стемминг.
+"""
+import re
+from functools import lru_cache
+
+FOLD = str.maketrans({'ё': 'е'})
+MAX_WORD_LENGTH = 64
+
+WORD_RE = re.compile(r'\w+')
+HASHTAG_RE = re.compile(r'(?<!\w)#(\w+)')
+
+VOWELS = 'аеиоуыэюя'
+RV_RE = re.compile(f'^(.*?[{VOWELS}])(.*)$')
+PERFECTIVE_GERUND_RE = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE_RE = re.compile(r'(с[яь])$')
+ADJECTIVE_RE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE_RE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB_RE = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено'
+    r'|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN_RE = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем'
+    r'|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+# Суффикс -ост(ь) отрезается, только если он лежит в области R2.
+DERIVATIONAL_RE = re.compile(f'[^{VOWELS}].*[{VOWELS}][^{VOWELS}].*ость?$')
+DERIVATIONAL_ENDING_RE = re.compile(r'ость?$')
+SUPERLATIVE_RE = re.compile(r'(ейше|ейш)$')
+I_RE = re.compile(r'и$')
+SOFT_SIGN_RE = re.compile(r'ь$')
+DOUBLE_N_RE = re.compile(r'нн$')
+
+STOP_WORDS = frozenset(word.translate(FOLD) for word in (
+    'а без более бы был была были было быть в вам вас весь во вот все '
+    'всего всех вы где да даже для до его ее если есть еще же за здесь и '
+    'из или им их к как ко когда кто ли либо мне может мы на над надо наш '
+    'не него нее нет ни них но ну о об однако он она они оно от очень по '
+    'под при с со так также такой там те тем то того тоже той только том '
+    'ты у уже хотя чего чей чем что чтобы чье чья эта эти это я'
+).split())
+
+
+def normalize(text):
+    """Текст в нижнем регистре с е вместо ё."""
+    return text.casefold().translate(FOLD)
+
+
+def words(text):
+    """Слова текста после normalize."""
+    return WORD_RE.findall(normalize(text))
+
+
+def _strip(pattern, word):
+    stripped = pattern.sub('', word, 1)
+    return stripped, stripped != word
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа слова по алгоритму Snowball для русского языка."""
+    match = RV_RE.match(word)
+    if not match:
+        return word
+    start, rv = match.groups()
+    rv, removed = _strip(PERFECTIVE_GERUND_RE, rv)
+    if not removed:
+        rv, _ = _strip(REFLEXIVE_RE, rv)
+        rv, removed = _strip(ADJECTIVE_RE, rv)
+        if removed:
+            rv, _ = _strip(PARTICIPLE_RE, rv)
+        else:
+            rv, removed = _strip(VERB_RE, rv)
+            if not removed:
+                rv, _ = _strip(NOUN_RE, rv)
+    rv, _ = _strip(I_RE, rv)
+    if DERIVATIONAL_RE.search(rv):
+        rv, _ = _strip(DERIVATIONAL_ENDING_RE, rv)
+    rv, removed = _strip(SUPERLATIVE_RE, rv)
+    if DOUBLE_N_RE.search(rv):
+        rv = rv[:-1]
+    elif not removed:
+        rv, _ = _strip(SOFT_SIGN_RE, rv)
+    return start + rv
+
+
+def terms(text):
+    """Основы значимых слов текста для поискового индекса."""
+    return [
+        stem(word)[:MAX_WORD_LENGTH] for word in words(text)
+        if word not in STOP_WORDS
+    ]
+
+
+def hashtags(text):
+    """Различные хештеги текста без решётки, в порядке появления."""
+    return list(dict.fromkeys(
+        normalize(tag) for tag in HASHTAG_RE.findall(text)
+    ))
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group, Comment, Follow
 
 
@@ -18,6 +19,13 @@ class PostAdmin(admin.ModelAdmin):
     list_per_page = 10
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по поисковому индексу вместо LIKE по тексту."""
+        matching = search.matching(search_term)
+        if matching is None:
+            return queryset, False
+        return queryset.filter(pk__in=matching), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,264 @@
+"""JSON API лент, профилей, записей и комментариев только для чтения.
+
+Строки выбираются через values_list только с запрошенными столбцами,
+без моделей и шаблонов, и сериализуются в компактный JSON. Ленты и
+комментарии листаются курсором, как KeysetPaginator, ?fields= оставляет
+в ответе только перечисленные поля, ?limit= задаёт размер страницы.
+ETag ленты считается до выборки строк по её состоянию, как у HTML-лент,
+и по версии API-ленты, которую меняют ещё и комментарии: comments_count
+есть только в ответах API. ETag остальных ответов - по их содержимому;
+Cache-Control разрешает общий кеш на API_CACHE_MAX_AGE секунд.
+"""
+import json
+from functools import wraps
+from hashlib import md5
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import (
+    condition, conditional_page, require_safe
+)
+
+from core.cache import get_version
+from core.replicas import read_replica
+
+from .conditional import feed_state, profile_feed
+from .models import Comment, Group, Post, Profile, User
+from .paginators import (
+    CURSOR_NEXT, KeysetPaginator, decode_cursor, encode_cursor
+)
+
+MAX_LIMIT = 100
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+PROFILE_FIELDS = {
+    'username': 'user__username',
+    'first_name': 'user__first_name',
+    'last_name': 'user__last_name',
+    'posts_count': 'posts_count',
+    'followers_count': 'followers_count',
+    'following_count': 'following_count',
+}
+CONVERTERS = {
+    'pub_date': lambda value: value.isoformat(),
+    'created': lambda value: value.isoformat(),
+    'image': lambda name: (
+        Post._meta.get_field('image').storage.url(name) if name else None
+    ),
+}
+
+encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class ApiError(Exception):
+    """Ошибка в параметрах запроса, отдаётся ответом 400."""
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        encoder.encode(data), status=status,
+        content_type='application/json; charset=utf-8'
+    )
+
+
+def api_view(etag_func=None):
+    """Общие обёртки представлений API: только GET и HEAD, чтение
+    с реплики, условные запросы, заголовки кеширования и ошибки
+    в JSON."""
+    def decorator(view):
+        if etag_func is None:
+            conditional_view = conditional_page(view)
+        else:
+            conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                response = conditional_view(request, *args, **kwargs)
+            except ApiError as error:
+                return json_response({'error': str(error)}, status=400)
+            except Http404:
+                return json_response({'error': 'Не найдено.'}, status=404)
+            patch_cache_control(
+                response, public=True, max_age=settings.API_CACHE_MAX_AGE
+            )
+            return response
+        return read_replica(require_safe(wrapper))
+    return decorator
+
+
+def selected_fields(request, available):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(available)
+    names = list(dict.fromkeys(name for name in fields.split(',') if name))
+    unknown = set(names) - set(available)
+    if unknown or not names:
+        raise ApiError(
+            f'Неизвестные поля: {", ".join(sorted(unknown))}. '
+            f'Доступны: {", ".join(available)}.'
+        )
+    return names
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        raise ApiError('limit должен быть числом.')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def page_key(request):
+    cursor = request.GET.get('cursor')
+    if not cursor:
+        return None
+    decoded = decode_cursor(cursor)
+    if decoded is None or decoded[0] != CURSOR_NEXT or decoded[1] is None:
+        raise ApiError('Неверный курсор.')
+    return decoded[1]
+
+
+def serialize(rows, names, columns):
+    """Превращает кортежи values_list в словари с полями names."""
+    positions = [
+        (name, columns.index(column), CONVERTERS.get(name))
+        for name, column in names
+    ]
+    return [
+        {
+            name: convert(row[index]) if convert else row[index]
+            for name, index, convert in positions
+        }
+        for row in rows
+    ]
+
+
+def keyset_page(request, queryset, available, date, descending):
+    """Страница строк queryset после курсора и курсор следующей."""
+    names = selected_fields(request, available)
+    limit = page_limit(request)
+    selected = [(name, available[name]) for name in names]
+    columns = list(dict.fromkeys(
+        [column for _, column in selected] + [date, 'id']
+    ))
+    rows = list(KeysetPaginator.ordered(
+        queryset, page_key(request), descending, date=date
+    ).values_list(*columns)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(CURSOR_NEXT, SimpleNamespace(
+            pub_date=last[columns.index(date)], pk=last[columns.index('id')]
+        ))
+    return {
+        'results': serialize(rows, selected, columns),
+        'next': next_cursor,
+    }
+
+
+def api_feed(feed):
+    """Версия API-ленты поверх ленты feed."""
+    return f'api:{feed}'
+
+
+def feed_etag(feed):
+    def etag(request, **kwargs):
+        name, posts = feed(**kwargs)
+        return md5('|'.join((
+            feed_state(request, name, posts), str(get_version(api_feed(name))),
+            request.GET.urlencode()
+        )).encode()).hexdigest()
+    return etag
+
+
+def posts_page(request, queryset):
+    return json_response(keyset_page(
+        request, queryset, POST_FIELDS, 'pub_date', descending=True
+    ))
+
+
+@api_view(etag_func=feed_etag(lambda: ('feed:index', Post.objects)))
+def index(request):
+    return posts_page(request, Post.objects.all())
+
+
+def group_feed(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        raise Http404
+    return f'feed:group:{group_id}', Post.objects.filter(group_id=group_id)
+
+
+@api_view(etag_func=feed_etag(group_feed))
+def group_posts(request, slug):
+    return posts_page(request, Post.objects.filter(group__slug=slug))
+
+
+def author_feed(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        raise Http404
+    return profile_feed(author_id), Post.objects.filter(author_id=author_id)
+
+
+@api_view(etag_func=feed_etag(author_feed))
+def profile_posts(request, username):
+    return posts_page(
+        request, Post.objects.filter(author__username=username)
+    )
+
+
+def detail(request, queryset, available):
+    names = selected_fields(request, available)
+    selected = [(name, available[name]) for name in names]
+    columns = list(dict.fromkeys(column for _, column in selected))
+    rows = serialize(queryset.values_list(*columns)[:1], selected, columns)
+    if not rows:
+        raise Http404
+    return json_response(rows[0])
+
+
+@api_view()
+def profile(request, username):
+    return detail(
+        request, Profile.objects.filter(user__username=username),
+        PROFILE_FIELDS
+    )
+
+
+@api_view()
+def post_detail(request, post_id):
+    return detail(request, Post.objects.filter(pk=post_id), POST_FIELDS)
+
+
+@api_view()
+def comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return json_response(keyset_page(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        'created', descending=False
+    ))
@@ -0,0 +1,106 @@
+"""Задачи manage.py backfill для производных данных записей."""
+from django.conf import settings
+
+from core.backfill import Backfill, register
+from core.text import terms
+
+from . import search, thumbnails, timeline
+from .counters import recount, recount_groups, recount_posts
+from .models import Comment, Post, ThumbnailJob
+
+
+@register
+class SearchBackfill(Backfill):
+    """Поисковый индекс записей."""
+    name = 'search'
+    model = 'posts.Post'
+
+    def process(self, queryset):
+        index = search.get_index()
+        for pk, text in queryset.values_list('pk', 'text').iterator(
+            chunk_size=self.chunk_size
+        ):
+            index.add(pk, terms(text))
+
+
+@register
+class ProfileCountersBackfill(Backfill):
+    """Счётчики записей и подписок в профилях."""
+    name = 'profiles'
+    model = settings.AUTH_USER_MODEL
+
+    def process(self, queryset):
+        recount(users=queryset.values('pk'))
+
+
+@register
+class PostCountersBackfill(Backfill):
+    """Счётчики комментариев записей."""
+    name = 'post_counters'
+    model = 'posts.Post'
+
+    def process(self, queryset):
+        recount_posts(queryset, Comment)
+
+
+@register
+class GroupCountersBackfill(Backfill):
+    """Счётчики записей групп."""
+    name = 'group_counters'
+    model = 'posts.Group'
+
+    def process(self, queryset):
+        recount_groups(queryset, Post)
+
+
+@register
+class TimelineBackfill(Backfill):
+    """Ленты подписок пользователей."""
+    name = 'timelines'
+    model = settings.AUTH_USER_MODEL
+    batch_size = 100
+
+    def process(self, queryset):
+        for user_id in queryset.values_list('pk', flat=True).iterator(
+            chunk_size=self.chunk_size
+        ):
+            timeline.rebuild(user_id)
+
+
+@register
+class CelebrityTimelineBackfill(Backfill):
+    """Записи авторов за время без раскладки в лентах подписчиков."""
+    name = 'celebrity_timelines'
+    model = 'posts.Profile'
+    batch_size = 10
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            celebrity=False, celebrity_since__isnull=False
+        )
+
+    def process(self, queryset):
+        for author_id, since in queryset.values_list(
+            'user', 'celebrity_since'
+        ):
+            timeline.backfill_author(author_id, since)
+
+
+@register
+class ThumbnailBackfill(Backfill):
+    """Задания на миниатюры картинок, для которых их ещё нет."""
+    name = 'thumbnails'
+    model = 'posts.Post'
+
+    def get_queryset(self):
+        return super().get_queryset().exclude(image='')
+
+    def process(self, queryset):
+        queued = set(ThumbnailJob.objects.filter(
+            post__in=queryset.values('pk'), status=ThumbnailJob.PENDING
+        ).values_list('post', flat=True))
+        for post in queryset.only('pk', 'image').iterator(
+            chunk_size=self.chunk_size
+        ):
+            if post.pk not in queued:
+                thumbnails.enqueue(post)
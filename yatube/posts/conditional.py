@@ -0,0 +1,129 @@
+"""Валидаторы условных GET-запросов к лентам и странице записи.
+
+ETag ленты собирается из её состояния, параметров запроса и
+пользователя. Состояние ленты - версия её данных в кеше и время
+последнего изменения её записей в базе; по нему же строится ключ кеша
+страниц ленты, так что процесс, не увидевший повышения версии, всё равно
+заметит новую или изменённую запись. На If-None-Match с тем же ETag
+отвечаем 304 без выборки записей и отрисовки шаблона. Группа, автор,
+запись и состояние ленты, по которым считаются валидаторы, запоминаются
+в запросе и повторно используются представлением, так что ответ 200 не
+стоит лишних запросов к базе.
+"""
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery
+from django.shortcuts import get_object_or_404
+
+from core.cache import get_version
+
+from .models import Comment, Group, Post
+
+User = get_user_model()
+
+
+def profile_feed(author_id):
+    return f'feed:profile:{author_id}'
+
+
+def _memoized(request, key, load):
+    loaded = request.__dict__.setdefault('_conditional', {})
+    if key not in loaded:
+        loaded[key] = load()
+    return loaded[key]
+
+
+def last_updated(posts):
+    """Запрос времени последнего изменения записей posts по индексу."""
+    return posts.order_by('-updated').values_list('updated', flat=True)[:1]
+
+
+def feed_state(request, feed, posts):
+    """Состояние ленты feed с записями posts, одно на запрос."""
+    def load():
+        updated = next(iter(last_updated(posts)), None)
+        # Состояние входит в ключи кеша, поэтому без пробелов.
+        return f'{get_version(feed)}:{updated and updated.isoformat()}'
+
+    return _memoized(request, ('feed', feed), load)
+
+
+def get_group(request, slug):
+    return _memoized(
+        request, ('group', slug),
+        lambda: get_object_or_404(Group, slug=slug)
+    )
+
+
+def get_author(request, username):
+    return _memoized(
+        request, ('author', username),
+        lambda: get_object_or_404(
+            User.objects.select_related('profile'), username=username
+        )
+    )
+
+
+def get_post(request, post_id):
+    return _memoized(
+        request, ('post', post_id),
+        lambda: get_object_or_404(
+            Post.objects.select_related('author__profile', 'group').annotate(
+                last_comment=Subquery(
+                    Comment.objects.filter(post=OuterRef('pk')).order_by(
+                        '-created'
+                    ).values('created')[:1]
+                )
+            ),
+            pk=post_id
+        )
+    )
+
+
+def _etag(request, *parts):
+    viewer = request.user.get_username()
+    return md5('|'.join(map(str, (
+        *parts, viewer, settings.POSTS_PAGINATION, request.GET.urlencode()
+    ))).encode()).hexdigest()
+
+
+def index_etag(request):
+    return _etag(request, feed_state(request, 'feed:index', Post.objects))
+
+
+def group_etag(request, slug):
+    group = get_group(request, slug)
+    return _etag(
+        request, feed_state(request, f'feed:group:{group.pk}', group.posts),
+        group.posts_count, group.title, group.description
+    )
+
+
+def profile_etag(request, username):
+    author = get_author(request, username)
+    author_profile = getattr(author, 'profile', None)
+    return _etag(
+        request, feed_state(request, profile_feed(author.pk), author.posts),
+        author.get_full_name(), author_profile and (
+            author_profile.posts_count, author_profile.followers_count,
+            author_profile.following_count
+        )
+    )
+
+
+def post_detail_etag(request, post_id):
+    post = get_post(request, post_id)
+    author_profile = getattr(post.author, 'profile', None)
+    return _etag(
+        request, post.updated.isoformat(), post.last_comment,
+        post.comments_count, post.author.get_full_name(),
+        author_profile and author_profile.posts_count,
+        post.group and (post.group.slug, post.group.title),
+    )
+
+
+def post_detail_last_modified(request, post_id):
+    post = get_post(request, post_id)
+    return max(post.updated, post.last_comment or post.updated)
@@ -0,0 +1,77 @@
+"""Денормализованные счётчики записей, комментариев и подписок.
+
+Счётчики меняются атомарно через F() в обработчиках сигналов,
+а команда recount пересчитывает их с нуля, если они разошлись с данными.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import router
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def bump(queryset, **deltas):
+    """Атомарно прибавляет дельты к полям строк queryset."""
+    queryset.update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def _count(model, field, outer='pk'):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)}).order_by().values(
+            field
+        ).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def recount(users=None):
+    """Пересчитывает счётчики и создаёт недостающие профили.
+
+    Если передан список id в users, пересчитываются только их профили.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('posts', 'Profile')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    missing = User.objects.filter(profile__isnull=True)
+    profiles = Profile.objects.all()
+    if users is not None:
+        missing = missing.filter(pk__in=users)
+        profiles = profiles.filter(user__in=users)
+    Profile.objects.bulk_create(
+        Profile(user_id=pk) for pk in missing.values_list('pk', flat=True)
+    )
+    profiles.update(
+        posts_count=_count(Post, 'author', outer='user'),
+        followers_count=_count(Follow, 'author', outer='user'),
+        following_count=_count(Follow, 'user', outer='user'),
+    )
+    if users is None:
+        recount_groups(Group.objects.all(), Post)
+        recount_posts(Post.objects.all(), Comment)
+
+
+def recount_groups(groups, Post):
+    """Пересчитывает число записей в группах queryset groups."""
+    groups.update(posts_count=_count(Post, 'group'))
+
+
+def recount_posts(posts, Comment):
+    """Пересчитывает число комментариев к записям queryset posts."""
+    posts.update(comments_count=_count(Comment, 'post'))
+
+
+def get_profile(user):
+    """Профиль пользователя; отсутствующий создаётся с пересчётом."""
+    Profile = apps.get_model('posts', 'Profile')
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        recount(users=[user.pk])
+        # Чтение могло уйти на реплику, где нового профиля ещё нет.
+        return Profile.objects.db_manager(
+            router.db_for_write(Profile)
+        ).get(user=user)
@@ -0,0 +1,63 @@
+"""Подписки пользователей в кеше.
+
+Для каждого пользователя в кеше лежит отсортированный массив id авторов,
+на которых он подписан, и проверка подписки - двоичный поиск по нему без
+запросов к базе. Ключ массива включает версию пользователя: сигналы
+Follow повышают её сразу и ещё раз после фиксации транзакции, поэтому
+массив, прочитанный из базы до фиксации, ложится под устаревший ключ и
+больше не читается. Запись подписок всегда идёт в базу, кеш служит
+только для чтения.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import bump_version, get_version
+
+from .models import Follow
+
+
+def _version_name(user_id):
+    return f'follows:{user_id}'
+
+
+def _key(user_id):
+    return f'follows:{user_id}:{get_version(_version_name(user_id))}'
+
+
+def followees(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id."""
+    key = _key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = array('q', Follow.objects.filter(user_id=user_id).order_by(
+            'author_id'
+        ).values_list('author_id', flat=True))
+        cache.add(key, ids, settings.FOLLOW_CACHE_TIMEOUT)
+    return ids
+
+
+def is_following(user_id, author_id):
+    ids = followees(user_id)
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def invalidate(user_id):
+    bump_version(_version_name(user_id))
+    transaction.on_commit(lambda: bump_version(_version_name(user_id)))
+
+
+def follow(user, author):
+    """Подписывает user на author; False, если подписка уже есть."""
+    if user.pk == author.pk:
+        return False
+    return Follow.objects.get_or_create(user=user, author=author)[1]
+
+
+def unfollow(user, author):
+    """Отписывает user от author; False, если подписки не было."""
+    return Follow.objects.filter(user=user, author=author).delete()[0] > 0
@@ -8,6 +8,15 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean(self):
+        error = getattr(self.files.get('image'), 'upload_error', None)
+        if error:
+            # Вместо общего сообщения ImageField о пустом файле
+            # показываем причину, по которой его отклонил обработчик.
+            self._errors.pop('image', None)
+            self.add_error('image', error)
+        return super().clean()
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.conditional import last_updated
+from posts.models import Comment, Post, TimelineEntry
+from posts.paginators import KeysetPaginator
+
+FILESORT_MARKERS = ('TEMP B-TREE FOR ORDER BY', 'Using filesort')
+
+
+class Command(BaseCommand):
+    help = 'Печатает план выполнения запросов каждой ленты.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pk', type=int, default=1,
+            help='id группы, автора, читателя и записи для запросов.'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Завершиться с ошибкой, если лента сортирует без индекса.'
+        )
+
+    def feeds(self, pk):
+        limit = settings.POSTS_PER_PAGE + 1
+        cursor_key = (timezone.now(), pk)
+        feeds = {
+            'posts:index': Post.objects.select_related('author', 'group'),
+            'posts:group_list': Post.objects.select_related(
+                'author').filter(group_id=pk),
+            'posts:profile': Post.objects.select_related(
+                'group').filter(author_id=pk),
+        }
+        for name, queryset in feeds.items():
+            for key in (None, cursor_key):
+                yield name, KeysetPaginator.ordered(
+                    queryset, key, descending=True)[:limit]
+            # Состояние ленты для ETag считается и на ответах 304.
+            yield f'{name} (состояние)', last_updated(queryset)
+        for key in (None, cursor_key):
+            yield 'posts:follow_index', KeysetPaginator.ordered(
+                TimelineEntry.objects.filter(user_id=pk),
+                key, descending=True, pk='post_id'
+            ).values_list('pub_date', 'post_id')[:limit]
+        yield 'posts:post_detail', Comment.objects.select_related(
+            'author').filter(post_id=pk)
+
+    def handle(self, *args, **options):
+        filesorts = []
+        for name, queryset in self.feeds(options['pk']):
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(plan + '\n')
+            if any(marker in plan for marker in FILESORT_MARKERS):
+                filesorts.append(name)
+        if filesorts and options['check']:
+            raise CommandError(
+                'Сортировка без индекса: ' + ', '.join(sorted(set(filesorts)))
+            )
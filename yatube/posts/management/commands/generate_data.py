@@ -0,0 +1,232 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from core import backfill
+from posts.counters import recount
+from posts.models import (
+    Comment, Follow, Group, Post, StoredImage, User
+)
+
+TEXT_POOL_SIZE = 2000
+
+
+def power_law(count, alpha):
+    """Накопленные веса распределения Ципфа для count элементов."""
+    return list(accumulate(1 / (rank + 1) ** alpha for rank in range(count)))
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now и auto_now_add, чтобы сохранить свои даты."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует пользователей, группы, записи, комментарии и подписки '
+        'пакетами bulk_create для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона для популярности авторов.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты записей.'
+        )
+        parser.add_argument(
+            '--images', type=float, default=0,
+            help='Доля записей с картинкой.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument(
+            '--skip-backfill', action='store_true',
+            help='Не строить поисковый индекс и ленты подписок.'
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.tag = f'{self.random.getrandbits(32):08x}'
+        faker = Faker('ru_RU')
+        faker.seed_instance(options['seed'])
+        self.texts = [faker.sentence(nb_words=12)
+                      for _ in range(TEXT_POOL_SIZE)]
+
+        users = self.generate_users(options['users'])
+        groups = self.generate_groups(options['groups'])
+        authors = power_law(len(users), options['alpha'])
+        posts = self.generate_posts(
+            options['posts'], users, authors, groups, options['days']
+        )
+        if options['images']:
+            self.attach_images(posts, options['images'])
+        self.generate_comments(options['comments'], posts, users)
+        self.generate_follows(options['follows'], users, authors)
+
+        self.timed('Счётчики', recount)
+        if not options['skip_backfill']:
+            backfill.autodiscover()
+            for name in ('search', 'timelines'):
+                self.timed(name, backfill.Runner(name).run)
+
+    def timed(self, label, function):
+        start = time.monotonic()
+        result = function()
+        self.stdout.write(
+            f'{label}: {time.monotonic() - start:.1f} с'
+        )
+        return result
+
+    def insert(self, model, objects, pks=True):
+        """Вставляет объекты пакетами.
+
+        Возвращает id новых строк или, если pks=False, только их число.
+        """
+        last_pk = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        start = time.monotonic()
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                self.flush(model, batch)
+        self.flush(model, batch)
+        elapsed = time.monotonic() - start
+        new = model.objects.filter(pk__gt=last_pk)
+        if pks:
+            new = list(new.order_by('pk').values_list('pk', flat=True))
+        count = len(new) if pks else new.count()
+        self.stdout.write(
+            f'{model.__name__}: {count} '
+            f'({count / elapsed if elapsed else 0:.0f} строк/с)'
+        )
+        return new if pks else count
+
+    @staticmethod
+    def flush(model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        batch.clear()
+
+    def text(self, sentences):
+        return ' '.join(self.random.choices(self.texts, k=sentences))
+
+    def generate_users(self, count):
+        password = make_password(None)
+        return self.insert(User, (
+            User(username=f'user_{self.tag}_{i}', password=password,
+                 first_name=f'Имя{i}', last_name=f'Фамилия{i}')
+            for i in range(count)
+        ))
+
+    def generate_groups(self, count):
+        return self.insert(Group, (
+            Group(title=f'Группа {self.tag} {i}', slug=f'group-{self.tag}-{i}',
+                  description=self.text(2))
+            for i in range(count)
+        ))
+
+    def pub_date(self, days):
+        # Квадрат равномерной величины сгущает даты к настоящему времени.
+        return self.now - timedelta(
+            seconds=days * 86400 * self.random.random() ** 2
+        )
+
+    def generate_posts(self, count, users, authors, groups, days):
+        group_ids = groups + [None] * max(len(groups), 1)
+        author_ids = self.random.choices(users, cum_weights=authors, k=count)
+        # Даты в порядке вставки, то есть в порядке id новых записей.
+        self.post_dates = [self.pub_date(days) for _ in range(count)]
+        fields = (Post._meta.get_field('pub_date'),
+                  Post._meta.get_field('updated'))
+        with explicit_dates(*fields):
+            return self.insert(Post, (
+                Post(author_id=author_id,
+                     text=self.text(self.random.randint(1, 6)),
+                     group_id=self.random.choice(group_ids),
+                     pub_date=date, updated=date)
+                for author_id, date in zip(author_ids, self.post_dates)
+            ))
+
+    def generate_comments(self, count, posts, users):
+        if not posts:
+            return 0
+        # Популярность записей тоже подчиняется степенному закону.
+        ranks = list(range(len(posts)))
+        self.random.shuffle(ranks)
+        chosen = self.random.choices(
+            ranks, cum_weights=power_law(len(posts), 1.0), k=count
+        )
+        with explicit_dates(Comment._meta.get_field('created')):
+            return self.insert(Comment, (
+                Comment(post_id=posts[i],
+                        author_id=self.random.choice(users),
+                        text=self.text(1),
+                        created=min(self.now, self.post_dates[i] + timedelta(
+                            minutes=self.random.expovariate(1 / 120))))
+                for i in chosen
+            ), pks=False)
+
+    def generate_follows(self, count, users, authors):
+        author_ids = self.random.choices(users, cum_weights=authors, k=count)
+        return self.insert(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in zip(
+                self.random.choices(users, k=count), author_ids
+            ) if user_id != author_id
+        ), pks=False)
+
+    def attach_images(self, posts, ratio, variants=20):
+        storage = Post._meta.get_field('image').storage
+        names = []
+        for i in range(variants):
+            buffer = BytesIO()
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new('RGB', (960, 339), color).save(buffer, 'JPEG')
+            names.append(storage.save(
+                f'posts/{self.tag}-{i}.jpg', ContentFile(buffer.getvalue())
+            ))
+        chosen = self.random.sample(posts, int(len(posts) * ratio))
+        by_name = {}
+        for post_id in chosen:
+            by_name.setdefault(self.random.choice(names), []).append(post_id)
+        for name, post_ids in by_name.items():
+            for start in range(0, len(post_ids), self.batch_size):
+                Post.objects.filter(
+                    pk__in=post_ids[start:start + self.batch_size]
+                ).update(image=name)
+            StoredImage.objects.get_or_create(name=name)
+            StoredImage.objects.filter(name=name).update(
+                references=Post.objects.filter(image=name).count()
+            )
+        self.stdout.write(f'Картинки: {len(chosen)}')
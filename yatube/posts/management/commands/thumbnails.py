@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры из очереди заданий. Можно запускать несколько '
+        'процессов: каждое задание забирает только один из них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь один раз и выйти.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между проверками пустой очереди, секунд.'
+        )
+        parser.add_argument(
+            '--stale', type=int,
+            default=settings.THUMBNAIL_STALE_TIMEOUT // 60,
+            help='Через сколько минут вернуть в очередь зависшие задания.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            thumbnails.requeue_stale(timedelta(minutes=options['stale']))
+            done = thumbnails.run_pending()
+            if done:
+                self.stdout.write(f'Обработано заданий: {done}')
+            if options['once']:
+                return
+            if not done:
+                time.sleep(options['interval'])
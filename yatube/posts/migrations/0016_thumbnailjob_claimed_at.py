@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:41
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def claim_running_jobs(apps, schema_editor):
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    ThumbnailJob.objects.filter(status='running').update(
+        claimed_at=F('created')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата начала выполнения'),
+        ),
+        migrations.RunPython(claim_running_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def mark_celebrities(apps, schema_editor):
+    """Записи авторов сверх предела могли не попасть в ленты с любого
+    момента, поэтому раскладка считается выключенной с регистрации."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('posts', 'Profile')
+    Profile.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).update(celebrity=True, celebrity_since=Subquery(
+        User.objects.filter(pk=OuterRef('user')).values('date_joined')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0018_post_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='celebrity',
+            field=models.BooleanField(default=False, verbose_name='Записи не раскладываются по лентам'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='celebrity_since',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата остановки раскладки записей'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,52 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
+class Profile(models.Model):
+    """Класс профиля автора со счётчиками записей и подписок."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.IntegerField(
+        default=0,
+        verbose_name='Число записей')
+    followers_count = models.IntegerField(
+        default=0,
+        verbose_name='Число подписчиков')
+    following_count = models.IntegerField(
+        default=0,
+        verbose_name='Число подписок')
+    celebrity = models.BooleanField(
+        default=False,
+        verbose_name='Записи не раскладываются по лентам')
+    celebrity_since = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата остановки раскладки записей')
+
+    def __str__(self):
+        return str(self.user)
+
+    class Meta:
+        verbose_name = 'Профиль'
+
+
 class Group(models.Model):
     """Класс для создания групп."""
     title = models.CharField(max_length=200, verbose_name='Имя группы')
     slug = models.SlugField(unique=True, verbose_name='Адрес')
     description = models.TextField(verbose_name='Описание группы')
+    posts_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число записей')
 
     def __str__(self):
         return self.title
@@ -26,6 +64,9 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации')
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения')
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -44,8 +85,13 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев')
 
     def __str__(self):
         return self.text[:15]
@@ -53,6 +99,26 @@ class Post(models.Model):
     class Meta:
         verbose_name = 'Запись'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(fields=['updated'], name='post_updated_idx'),
+            models.Index(
+                fields=['author', '-updated'], name='post_author_updated_idx'
+            ),
+            models.Index(
+                fields=['group', '-updated'], name='post_group_updated_idx'
+            ),
+        )
 
 
 class Comment(models.Model):
@@ -80,6 +146,11 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=['post', '-created'], name='comment_post_created_idx'
+            ),
+        )
 
 
 class Follow(models.Model):
@@ -104,3 +175,129 @@ class Follow(models.Model):
         constraints = (models.UniqueConstraint(
             fields=['author', 'user'], name='unique_follow'
         ),)
+        indexes = (
+            models.Index(
+                fields=['user', 'author'], name='follow_user_author_idx'
+            ),
+        )
+
+
+class TimelineEntry(models.Model):
+    """Класс записи в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Запись'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        ordering = ('-pub_date', '-post_id')
+        constraints = (models.UniqueConstraint(
+            fields=['user', 'post'], name='unique_timeline_entry'
+        ),)
+        indexes = (
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+        )
+
+
+class ThumbnailJob(models.Model):
+    """Класс задания на построение миниатюры картинки записи."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnail_jobs',
+        verbose_name='Запись'
+    )
+    image = models.CharField(max_length=255, verbose_name='Картинка')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Состояние'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата постановки в очередь')
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата начала выполнения')
+
+    class Meta:
+        verbose_name = 'Задание на миниатюру'
+        ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=['status', 'created'], name='thumbnail_job_status_idx'
+            ),
+        )
+
+
+class StoredImage(models.Model):
+    """Класс учёта ссылок записей на файл картинки."""
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Файл')
+    references = models.IntegerField(
+        default=0,
+        verbose_name='Число ссылок')
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+
+
+class SearchTerm(models.Model):
+    """Класс вхождения слова в запись для поиска без FTS5."""
+    term = models.CharField(max_length=64, verbose_name='Слово')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Запись'
+    )
+    frequency = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Число вхождений')
+
+    class Meta:
+        verbose_name = 'Слово записи'
+        unique_together = ('term', 'post')
@@ -0,0 +1,225 @@
+import base64
+import binascii
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import DatabaseError, close_old_connections, connections
+from django.db import router
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from core.cache import get_version
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+REFRESH_LOCK_TIMEOUT = 60
+
+_executor = None
+
+
+def encode_cursor(direction, post=None):
+    """Упаковывает позицию (pub_date, id) в непрозрачный токен."""
+    raw = direction
+    if post is not None:
+        raw = f'{direction}|{post.pub_date.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора, для испорченного токена возвращает None."""
+    try:
+        raw = base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)
+        ).decode()
+        direction, *key = raw.split('|')
+        if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+            return None
+        if not key:
+            return direction, None
+        pub_date, pk = key
+        pub_date = parse_datetime(pub_date)
+        if pub_date is None:
+            return None
+        return direction, (pub_date, int(pk))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Страница выбирается условием на ключ и LIMIT, без OFFSET и COUNT(*),
+    поэтому любая страница ленты стоит столько же, сколько первая.
+    Возвращает обычный Page с атрибутами next_cursor и previous_cursor.
+    """
+    keyset = True
+    last_cursor = encode_cursor(CURSOR_PREVIOUS)
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor) if cursor else None
+        direction, key = decoded or (CURSOR_NEXT, None)
+        if direction == CURSOR_NEXT:
+            posts, has_more = self._slice(key, descending=True)
+            has_next, has_previous = has_more, key is not None
+        else:
+            posts, has_more = self._slice(key, descending=False)
+            posts.reverse()
+            has_next, has_previous = key is not None, has_more
+        page = Page(posts, None, self)
+        page.next_cursor = (
+            encode_cursor(CURSOR_NEXT, posts[-1])
+            if has_next and posts else None
+        )
+        page.previous_cursor = (
+            encode_cursor(CURSOR_PREVIOUS, posts[0])
+            if has_previous and posts else None
+        )
+        return page
+
+    def _slice(self, key, descending):
+        posts = list(
+            self.ordered(self.object_list, key, descending)[:self.per_page + 1]
+        )
+        return posts[:self.per_page], len(posts) > self.per_page
+
+    @staticmethod
+    def ordered(queryset, key, descending, pk='pk', date='pub_date'):
+        """Упорядочивает queryset по ключу и отсекает всё до курсора."""
+        if descending:
+            order, lookup = (f'-{date}', f'-{pk}'), 'lt'
+        else:
+            order, lookup = (date, pk), 'gt'
+        if key is not None:
+            # Нестрогое условие на pub_date отдельно от OR даёт планировщику
+            # границу диапазона индекса, а не проход от его начала.
+            queryset = queryset.filter(
+                Q(**{f'{date}__{lookup}e': key[0]}),
+                Q(**{f'{date}__{lookup}': key[0]})
+                | Q(**{f'{pk}__{lookup}': key[1]})
+            )
+        return queryset.order_by(*order)
+
+
+def estimate_rows(model):
+    """Число строк таблицы model по статистике базы.
+
+    SQLite хранит его в sqlite_stat1 после ANALYZE, PostgreSQL - в
+    pg_class.reltuples. Без статистики берётся наибольший первичный ключ:
+    он не меньше числа строк и читается из индекса.
+    """
+    using = router.db_for_read(model)
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+        'postgresql': 'SELECT reltuples FROM pg_class WHERE relname = %s',
+    }
+    row = None
+    if connection.vendor in queries:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(queries[connection.vendor], [table])
+                row = cursor.fetchone()
+        except DatabaseError:
+            row = None
+    rows = int(float(str(row[0]).split()[0])) if row else 0
+    if rows > 0:
+        return rows
+    return model.objects.using(using).aggregate(
+        count=Max('pk')
+    )['count'] or 0
+
+
+class ApproximatePaginator(Paginator):
+    """Нумерованный пагинатор ленты feed без COUNT(*) на каждой странице.
+
+    Точное число записей хранится в кеше под версией ленты и верно, пока
+    она не изменилась. Для ленты длиннее APPROXIMATE_COUNT_THRESHOLD
+    записей берётся последнее известное число или, пока его нет, оценка
+    estimate(), а точное пересчитывается в фоне не чаще раза
+    в COUNT_REFRESH_INTERVAL секунд. approximate сообщает шаблонам,
+    что count приблизительный.
+    """
+
+    def __init__(self, object_list, per_page, feed, estimate=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.feed = feed
+        self.estimate = estimate
+        self._approximate = False
+
+    @property
+    def approximate(self):
+        self.count
+        return self._approximate
+
+    @cached_property
+    def count(self):
+        exact_key = f'count:{self.feed}:{get_version(self.feed)}'
+        known_key = f'count:{self.feed}'
+        cached = cache.get_many([exact_key, known_key])
+        if exact_key in cached:
+            return cached[exact_key]
+        known, refreshed = cached.get(known_key, (None, None))
+        if known is None and self.estimate is not None:
+            known = self.estimate()
+        if known is not None and (
+            known >= settings.APPROXIMATE_COUNT_THRESHOLD
+        ):
+            if refreshed is None or (
+                time.time() - refreshed > settings.COUNT_REFRESH_INTERVAL
+            ):
+                self.refresh()
+            self._approximate = True
+            return known
+        count = super().count
+        cache.set(exact_key, count, settings.FEED_CACHE_TIMEOUT)
+        cache.set(
+            known_key, (count, time.time()), settings.COUNT_CACHE_TIMEOUT
+        )
+        return count
+
+    def refresh(self):
+        """Пересчитывает точное число записей в фоновом потоке
+        или, если COUNT_REFRESH_WORKERS = 0, сразу."""
+        lock_key = f'count:{self.feed}:refresh'
+        if not cache.add(lock_key, True, REFRESH_LOCK_TIMEOUT):
+            return
+        queryset = self.object_list.all()
+        if not settings.COUNT_REFRESH_WORKERS:
+            refresh_count(self.feed, queryset, lock_key)
+            return
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.COUNT_REFRESH_WORKERS,
+                thread_name_prefix='counts'
+            )
+        _executor.submit(_refresh_in_thread, self.feed, queryset, lock_key)
+
+
+def refresh_count(feed, queryset, lock_key):
+    try:
+        cache.set(
+            f'count:{feed}', (queryset.count(), time.time()),
+            settings.COUNT_CACHE_TIMEOUT
+        )
+    finally:
+        cache.delete(lock_key)
+
+
+def _refresh_in_thread(feed, queryset, lock_key):
+    close_old_connections()
+    try:
+        refresh_count(feed, queryset, lock_key)
+    except Exception:
+        logger.exception('Пересчёт числа записей ленты %s не удался', feed)
+    finally:
+        close_old_connections()
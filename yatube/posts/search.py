@@ -0,0 +1,181 @@
+"""Полнотекстовый поиск по записям.
+
+Текст записи разбирается core.text, и в индекс попадают основы слов без
+стоп-слов, поэтому оба индекса ищут одинаково и находят словоформы. На SQLite
+индекс - виртуальная таблица FTS5 с ранжированием bm25, на других СУБД -
+таблица SearchTerm со словами и числом их вхождений. Индекс обновляют
+сигналы сохранения и удаления записи, а rebuild строит его заново;
+после смены разбора текста индекс перестраивает
+manage.py backfill search --restart.
+"""
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.db.models.expressions import RawSQL
+
+from core.text import terms as text_terms
+
+FTS_TABLE = 'posts_post_fts'
+MAX_TERMS = 10
+
+
+def query_terms(query):
+    """Различные основы слов запроса в порядке появления."""
+    return list(dict.fromkeys(text_terms(query)))[:MAX_TERMS]
+
+
+class RawSubquery(RawSQL):
+    """Подзапрос для __in: скобки вокруг него ставит сам lookup."""
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+class Fts5Index:
+    """Индекс в виртуальной таблице SQLite FTS5."""
+
+    @staticmethod
+    def execute(sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def add(self, post_id, terms):
+        self.remove(post_id)
+        self.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+            [post_id, ' '.join(terms)]
+        )
+
+    def remove(self, post_id):
+        self.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+    def clear(self):
+        self.execute(f'DELETE FROM {FTS_TABLE}')
+
+    @staticmethod
+    def match(terms):
+        # Слова состоят только из \w, поэтому кавычки внутри не встречаются.
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def matching(self, terms):
+        return RawSubquery(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [self.match(terms)]
+        )
+
+    def count(self, terms):
+        return self.execute(
+            f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [self.match(terms)]
+        )[0][0]
+
+    def ranked(self, terms, offset, limit):
+        return [row[0] for row in self.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'ORDER BY rank LIMIT %s OFFSET %s',
+            [self.match(terms), limit, offset]
+        )]
+
+
+class TermIndex:
+    """Индекс в обычной таблице слов для СУБД без FTS5."""
+
+    @staticmethod
+    def model():
+        return apps.get_model('posts', 'SearchTerm')
+
+    def add(self, post_id, terms):
+        SearchTerm = self.model()
+        SearchTerm.objects.filter(post=post_id).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post_id=post_id, frequency=frequency)
+            for term, frequency in Counter(terms).items()
+        )
+
+    def remove(self, post_id):
+        self.model().objects.filter(post=post_id).delete()
+
+    def clear(self):
+        self.model().objects.all().delete()
+
+    def scored(self, terms):
+        return self.model().objects.filter(term__in=terms).order_by().values(
+            'post'
+        ).annotate(
+            matched=Count('term'), score=Sum('frequency')
+        ).filter(matched=len(terms))
+
+    def matching(self, terms):
+        return self.scored(terms).values('post')
+
+    def count(self, terms):
+        return self.scored(terms).count()
+
+    def ranked(self, terms, offset, limit):
+        return list(self.scored(terms).order_by(
+            F('score').desc(), F('post').desc()
+        ).values_list('post', flat=True)[offset:offset + limit])
+
+
+def get_index():
+    backend = settings.SEARCH_BACKEND
+    if backend == 'auto':
+        backend = 'fts5' if connection.vendor == 'sqlite' else 'terms'
+    return Fts5Index() if backend == 'fts5' else TermIndex()
+
+
+def index_post(post):
+    get_index().add(post.pk, text_terms(post.text))
+
+
+def remove_post(post_id):
+    get_index().remove(post_id)
+
+
+def rebuild(batch_size=1000):
+    """Строит индекс заново по всем записям."""
+    Post = apps.get_model('posts', 'Post')
+    index = get_index()
+    index.clear()
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    for post_id, text in posts.iterator(chunk_size=batch_size):
+        index.add(post_id, text_terms(text))
+
+
+def matching(query):
+    """Подзапрос id записей, содержащих все слова запроса."""
+    terms = query_terms(query)
+    return get_index().matching(terms) if terms else None
+
+
+class SearchResults:
+    """Найденные записи по убыванию релевантности.
+
+    Ведёт себя как последовательность для Paginator: считает совпадения
+    и загружает только записи запрошенной страницы.
+    """
+
+    def __init__(self, query, queryset):
+        self.terms = query_terms(query)
+        self.queryset = queryset
+        self.index = get_index()
+
+    def count(self):
+        return self.index.count(self.terms) if self.terms else 0
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or not self.terms:
+            return list(self)[key]
+        ids = self.index.ranked(self.terms, key.start, key.stop - key.start)
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def __iter__(self):
+        return iter(self[0:self.count()] if self.terms else [])
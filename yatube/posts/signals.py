@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump_version
+
+from . import follows, search, storage, thumbnails, timeline
+from .api import api_feed
+from .conditional import profile_feed
+from .counters import bump
+from .models import Comment, Follow, Group, Post, Profile
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.create(user=instance)
+
+
+def bump_feeds(author_id, *group_ids):
+    bump_version('feed:index')
+    bump_version(profile_feed(author_id))
+    for group_id in set(group_ids) - {None}:
+        bump_version(f'feed:group:{group_id}')
+
+
+@receiver(pre_save, sender=User)
+def remember_name(sender, instance, update_fields=None, **kwargs):
+    instance._saved_name = None
+    if update_fields is None or {'first_name', 'last_name'} & set(
+        update_fields
+    ):
+        instance._saved_name = User.objects.filter(
+            pk=instance.pk
+        ).values_list('first_name', 'last_name').first()
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, **kwargs):
+    saved_name = getattr(instance, '_saved_name', None)
+    if created or saved_name is None or saved_name == (
+        instance.first_name, instance.last_name
+    ):
+        return
+    bump_feeds(instance.pk, *Post.objects.filter(
+        author=instance.pk
+    ).values_list('group', flat=True).distinct())
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved(sender, instance, **kwargs):
+    (
+        instance._saved_group_id, instance._saved_image, instance._saved_text
+    ) = Post.objects.filter(pk=instance.pk).values_list(
+        'group', 'image', 'text'
+    ).first() or (None, '', None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        bump(Profile.objects.filter(user=instance.author_id), posts_count=1)
+        timeline.fan_out(instance)
+    if instance._saved_group_id != instance.group_id:
+        bump(Group.objects.filter(pk=instance._saved_group_id), posts_count=-1)
+        bump(Group.objects.filter(pk=instance.group_id), posts_count=1)
+    bump_feeds(
+        instance.author_id, instance._saved_group_id, instance.group_id
+    )
+    if instance._saved_text != instance.text:
+        search.index_post(instance)
+    if instance._saved_image != (instance.image.name or ''):
+        storage.retain(instance.image.name)
+        storage.release(instance._saved_image, instance.image.storage)
+        if instance.image:
+            thumbnails.enqueue(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump(Profile.objects.filter(user=instance.author_id), posts_count=-1)
+    bump(Group.objects.filter(pk=instance.group_id), posts_count=-1)
+    bump_feeds(instance.author_id, instance.group_id)
+    search.remove_post(instance.pk)
+    storage.release(instance.image.name, instance.image.storage)
+
+
+def bump_api_feeds(post_id):
+    """Меняет версии API-лент, где видно comments_count записи."""
+    for author_id, group_id in Post.objects.filter(pk=post_id).values_list(
+        'author', 'group'
+    ):
+        bump_version(api_feed('feed:index'))
+        bump_version(api_feed(profile_feed(author_id)))
+        if group_id is not None:
+            bump_version(api_feed(f'feed:group:{group_id}'))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        bump(Post.objects.filter(pk=instance.post_id), comments_count=1)
+        bump_api_feeds(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), comments_count=-1)
+    bump_api_feeds(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        bump(Profile.objects.filter(user=instance.author_id),
+             followers_count=1)
+        bump(Profile.objects.filter(user=instance.user_id),
+             following_count=1)
+        timeline.followers_changed(instance.author_id, 1)
+        timeline.follow(instance.user_id, instance.author_id)
+        follows.invalidate(instance.user_id)
+        bump_version(profile_feed(instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump(Profile.objects.filter(user=instance.author_id), followers_count=-1)
+    bump(Profile.objects.filter(user=instance.user_id), following_count=-1)
+    timeline.unfollow(instance.user_id, instance.author_id)
+    timeline.followers_changed(instance.author_id, -1)
+    follows.invalidate(instance.user_id)
+    bump_version(profile_feed(instance.author_id))
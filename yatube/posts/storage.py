@@ -0,0 +1,92 @@
+"""Хранилище картинок записей с адресацией по содержимому.
+
+Файл называется SHA-256 своего содержимого и раскладывается по
+подкаталогам из первых символов хеша, поэтому одинаковая картинка,
+загруженная разными пользователями, хранится один раз и получает одно имя.
+Миниатюры sorl привязаны к имени исходного файла, так что повторная
+загрузка сразу находит уже построенную миниатюру. Число записей,
+ссылающихся на файл, хранится в StoredImage: файл и его миниатюры
+удаляются, когда ссылок не остаётся.
+"""
+import hashlib
+import logging
+import os
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .counters import bump
+
+logger = logging.getLogger(__name__)
+
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def content_hash(content):
+    """SHA-256 содержимого файла, прочитанного по кускам."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, которое не пишет файл повторно."""
+
+    def content_name(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        shards = [
+            digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+            for i in range(SHARD_DEPTH)
+        ]
+        return os.path.join(directory, *shards, digest + extension)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        # Если тот же файл одновременно пишет другой запрос,
+        # FileSystemStorage сохранит копию под именем с суффиксом.
+        return super()._save(name, content)
+
+
+def retain(name):
+    """Учитывает ещё одну ссылку на файл."""
+    if not name:
+        return
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    StoredImage.objects.get_or_create(name=name)
+    bump(StoredImage.objects.filter(name=name), references=1)
+
+
+def release(name, storage):
+    """Снимает ссылку на файл и удаляет его, если ссылок не осталось."""
+    if not name:
+        return
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    bump(StoredImage.objects.filter(name=name), references=-1)
+    deleted, _ = StoredImage.objects.filter(
+        name=name, references__lte=0
+    ).delete()
+    if deleted:
+        transaction.on_commit(lambda: _delete_file(name, storage))
+
+
+def _delete_file(name, storage):
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    if StoredImage.objects.filter(name=name).exists():
+        return
+    image_file = ImageFile(name, storage)
+    try:
+        default.kvstore.delete(image_file)
+        image_file.delete()
+    except Exception:
+        logger.exception('Не удалось удалить файл картинки %s', name)
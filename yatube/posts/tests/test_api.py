@@ -0,0 +1,187 @@
+import json
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+INDEX_URL = reverse('api:index')
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='testAuthor', first_name='Тест', last_name='Автор'
+        )
+        cls.group = Group.objects.create(
+            title='Тест-группа',
+            slug='test-slug',
+            description='Тест-описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Тест-пост {i}', group=cls.group
+            )
+            for i in range(5)
+        ]
+        cls.post = cls.posts[-1]
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {i}'
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_json(self, url, status=HTTPStatus.OK, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response['Content-Type'],
+                         'application/json; charset=utf-8')
+        return json.loads(response.content)
+
+    def test_feeds(self):
+        """Проверяем, что ленты отдают записи от новых к старым
+        со всеми полями."""
+        urls = (
+            INDEX_URL,
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:profile_posts',
+                    kwargs={'username': self.author.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.get_json(url)
+                self.assertEqual(
+                    [row['id'] for row in data['results']],
+                    [post.pk for post in reversed(self.posts)]
+                )
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.pk,
+                    'text': self.post.text,
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': self.author.username,
+                    'group': self.group.slug,
+                    'image': None,
+                    'comments_count': 3,
+                })
+                self.assertIsNone(data['next'])
+
+    def test_fields(self):
+        """Проверяем выбор полей и ошибку для неизвестного поля."""
+        data = self.get_json(INDEX_URL, fields='id,author')
+        self.assertEqual(data['results'][0],
+                         {'id': self.post.pk, 'author': 'testAuthor'})
+        data = self.get_json(INDEX_URL, HTTPStatus.BAD_REQUEST,
+                             fields='id,password')
+        self.assertIn('password', data['error'])
+
+    def test_cursor_pagination(self):
+        """Проверяем, что курсор обходит ленту без пропусков и повторов."""
+        seen, cursor = [], ''
+        while cursor is not None:
+            data = self.get_json(INDEX_URL, limit=2, cursor=cursor,
+                                 fields='id')
+            self.assertLessEqual(len(data['results']), 2)
+            seen += [row['id'] for row in data['results']]
+            cursor = data['next']
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+        self.get_json(INDEX_URL, HTTPStatus.BAD_REQUEST, cursor='испорчен')
+
+    def test_detail_and_comments(self):
+        """Проверяем страницу записи, профиль и комментарии по порядку."""
+        data = self.get_json(
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk}),
+            fields='id,text'
+        )
+        self.assertEqual(data, {'id': self.post.pk, 'text': self.post.text})
+        data = self.get_json(
+            reverse('api:profile', kwargs={'username': 'testAuthor'})
+        )
+        self.assertEqual(data['posts_count'], 5)
+        self.assertEqual(data['first_name'], 'Тест')
+        data = self.get_json(
+            reverse('api:comments', kwargs={'post_id': self.post.pk}),
+            limit=2
+        )
+        self.assertEqual([row['id'] for row in data['results']],
+                         [comment.pk for comment in self.comments[:2]])
+        data = self.get_json(
+            reverse('api:comments', kwargs={'post_id': self.post.pk}),
+            cursor=data['next']
+        )
+        self.assertEqual([row['id'] for row in data['results']],
+                         [self.comments[2].pk])
+
+    def test_not_found(self):
+        """Проверяем ответ 404 в JSON для несуществующих объектов."""
+        for url in (
+            reverse('api:post_detail', kwargs={'post_id': 0}),
+            reverse('api:comments', kwargs={'post_id': 0}),
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile', kwargs={'username': 'missing'}),
+            reverse('api:profile_posts', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                self.get_json(url, HTTPStatus.NOT_FOUND)
+
+    def test_cache_headers(self):
+        """Проверяем Cache-Control и ответ 304 на неизменённую ленту
+        за один запрос состояния ленты."""
+        response = self.client.get(INDEX_URL)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(f'max-age={settings.API_CACHE_MAX_AGE}',
+                      response['Cache-Control'])
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(INDEX_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(INDEX_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            self.client.post(INDEX_URL).status_code,
+            HTTPStatus.METHOD_NOT_ALLOWED
+        )
+
+    def test_comments_change_feed_etag(self):
+        """Проверяем, что новый и удалённый комментарий меняют ETag
+        API-лент, в которых виден comments_count поста, но не HTML-лент."""
+        urls = [
+            INDEX_URL,
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:profile_posts', args=[self.author.username]),
+        ]
+        for change in (
+            lambda: Comment.objects.create(
+                post=self.post, author=self.author, text='Ещё комментарий'
+            ),
+            lambda: Comment.objects.get(pk=self.comments[0].pk).delete(),
+        ):
+            etags = [self.client.get(url)['ETag'] for url in urls]
+            html_etag = self.client.get(reverse('posts:index'))['ETag']
+            change()
+            self.assertEqual(
+                self.client.get(
+                    reverse('posts:index'), HTTP_IF_NONE_MATCH=html_etag
+                ).status_code,
+                HTTPStatus.NOT_MODIFIED
+            )
+            for url, etag in zip(urls, etags):
+                with self.subTest(url=url):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_feed_single_query(self):
+        """Проверяем, что страница ленты стоит запроса состояния ленты
+        и одного запроса строк."""
+        with self.assertNumQueries(2):
+            self.client.get(INDEX_URL)
@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from core.models import BackfillCheckpoint
+from posts import search
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ExplainFeedsCommandTests(TestCase):
+    def test_feeds_use_indexes(self):
+        """Проверяем, что ни одна лента не сортирует записи без индекса."""
+        out = StringIO()
+        call_command('explain_feeds', check=True, stdout=out)
+        self.assertIn('post_pub_date_idx', out.getvalue())
+        self.assertIn('timeline_user_pub_date_idx', out.getvalue())
+        self.assertIn('post_group_updated_idx', out.getvalue())
+        self.assertIn('post_author_updated_idx', out.getvalue())
+
+
+class BackfillCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='testAuthor')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Ёжик номер {i}')
+            for i in range(5)
+        ]
+
+    def found(self):
+        return set(Post.objects.filter(pk__in=search.matching('ежик')))
+
+    def test_backfill_resumes_from_checkpoint(self):
+        """Проверяем, что пересчёт продолжается с отметки
+        и начинается заново с --restart."""
+        search.get_index().clear()
+        BackfillCheckpoint.objects.create(
+            name='search', last_pk=self.posts[2].pk
+        )
+        out = StringIO()
+        call_command('backfill', 'search', batch_size=2, stdout=out)
+        self.assertEqual(self.found(), set(self.posts[3:]))
+        self.assertIn('2 из 2', out.getvalue())
+        search.get_index().clear()
+        BackfillCheckpoint.objects.create(
+            name='search', last_pk=self.posts[2].pk
+        )
+        call_command('backfill', 'search', restart=True, stdout=out)
+        self.assertEqual(self.found(), set(self.posts))
+
+    def test_finished_backfill_starts_over(self):
+        """Проверяем, что после законченного пересчёта отметка
+        удаляется и следующий запуск проходит все строки."""
+        out = StringIO()
+        call_command('backfill', 'search', stdout=out)
+        self.assertFalse(BackfillCheckpoint.objects.exists())
+        search.get_index().clear()
+        call_command('backfill', 'search', stdout=out)
+        self.assertEqual(self.found(), set(self.posts))
+
+    def test_unknown_backfill(self):
+        """Проверяем, что неизвестная задача даёт ошибку."""
+        with self.assertRaises(CommandError):
+            call_command('backfill', 'unknown', stdout=StringIO())
+
+
+class GenerateDataCommandTests(TestCase):
+    def test_generate_data(self):
+        """Проверяем, что генератор создаёт заданное число строк
+        с датами в прошлом и комментариями после записей."""
+        call_command(
+            'generate_data', users=10, groups=2, posts=50, comments=40,
+            follows=20, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(0 < Follow.objects.count() <= 20)
+        self.assertGreater(
+            Post.objects.values('pub_date__date').distinct().count(), 1
+        )
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+        post = Post.objects.first()
+        word = max(post.text.split(), key=len)
+        self.assertIn(post, Post.objects.filter(pk__in=search.matching(word)))
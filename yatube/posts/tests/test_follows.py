@@ -0,0 +1,87 @@
+import random
+from array import array
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Follow, User
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f'user{i}') for i in range(6)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.users[0])
+
+    def assertGraphMatchesRows(self):
+        for user in self.users:
+            expected = sorted(Follow.objects.filter(
+                user=user
+            ).values_list('author_id', flat=True))
+            with self.subTest(user=user.username):
+                self.assertEqual(list(follows.followees(user.pk)), expected)
+                for author in self.users:
+                    self.assertEqual(
+                        follows.is_following(user.pk, author.pk),
+                        author.pk in expected
+                    )
+
+    def test_cache_matches_follow_rows(self):
+        """Проверяем, что подписки в кеше совпадают со строками Follow
+        после подписок и отписок через сервис, ORM и удаления
+        пользователя."""
+        rng = random.Random(1)
+        for _ in range(60):
+            user, author = rng.choice(self.users), rng.choice(self.users)
+            action = rng.choice([
+                follows.follow, follows.unfollow,
+                lambda user, author: Follow.objects.get_or_create(
+                    user=user, author=author
+                ),
+                lambda user, author: Follow.objects.filter(
+                    user=user, author=author
+                ).delete(),
+            ])
+            action(user, author)
+            self.assertGraphMatchesRows()
+        User.objects.filter(pk=self.users[-1].pk).delete()
+        self.assertGraphMatchesRows()
+
+    def test_views_follow_and_unfollow(self):
+        """Проверяем, что профиль показывает подписку из кеша, а
+        повторная подписка и отписка проверяются по базе и ничего не
+        меняют."""
+        author = self.users[1]
+        profile_url = reverse('posts:profile', args=[author.username])
+        for name, following in [
+            ('posts:profile_follow', True),
+            ('posts:profile_unfollow', False),
+        ]:
+            for _ in range(2):
+                self.client.get(reverse(name, args=[author]))
+                self.assertEqual(
+                    self.client.get(profile_url).context['following'],
+                    following
+                )
+                self.assertEqual(Follow.objects.filter(
+                    user=self.users[0], author=author
+                ).count(), int(following))
+        self.assertGraphMatchesRows()
+
+    def test_stale_read_not_cached_after_write(self):
+        """Проверяем, что массив, прочитанный из базы до подписки и
+        положенный в кеш после неё, не читается."""
+        user, author = self.users[0], self.users[1]
+        stale_key = follows._key(user.pk)
+        self.assertTrue(follows.follow(user, author))
+        cache.add(stale_key, array('q'))
+        self.assertTrue(follows.is_following(user.pk, author.pk))
+        self.assertFalse(follows.follow(user, author))
@@ -1,20 +1,29 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
+from django.core.cache import cache
 from http import HTTPStatus
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
+from PIL import Image
 
-from posts.models import Group, Post, User, Comment
+from posts import thumbnails, uploadhandlers
+from posts.models import (
+    Group, Post, User, Comment, StoredImage, ThumbnailJob
+)
 
 POST_CREATE_URL = reverse('posts:post_create')
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -41,7 +50,8 @@ class PostFormTests(TestCase):
             b'\x0A\x00\x3B'
         )
         cls.small_gif_name = 'small.gif'
-        cls.image = 'posts/small.gif'
+        digest = hashlib.sha256(cls.small_gif).hexdigest()
+        cls.image = f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
 
         cls.POST_DETAIL_URL = reverse(
             'posts:post_detail', kwargs={'post_id': f'{cls.post.id}'}
@@ -142,3 +152,131 @@ class PostFormTests(TestCase):
         self.assertEqual(Comment.objects.count(), 0)
         self.assertRedirects(
             comment_response, f'{login_url}?next={target}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='testAuthorized')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def make_jpeg(self, size=(40, 30)):
+        exif = Image.Exif()
+        exif[0x010F] = 'Тест-камера'
+        buffer = BytesIO()
+        Image.new('RGB', size).save(buffer, 'JPEG', exif=exif.tobytes())
+        return buffer.getvalue()
+
+    def upload(self, content, name='photo.jpg'):
+        return self.authorized_client.post(POST_CREATE_URL, data={
+            'text': 'Запись с картинкой',
+            'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+        })
+
+    def test_exif_stripped(self):
+        """Проверяем, что из загруженной картинки вырезан EXIF."""
+        content = self.make_jpeg()
+        self.assertIn(b'Exif', content)
+        self.upload(content)
+        post = Post.objects.get()
+        with post.image.open('rb') as image_file:
+            stored = image_file.read()
+        self.assertNotIn(b'Exif', stored)
+        with Image.open(BytesIO(stored)) as image:
+            self.assertEqual(image.size, (40, 30))
+
+    def test_rejected_uploads(self):
+        """Проверяем, что неподходящие файлы отклоняются
+        с понятной причиной."""
+        cases = [
+            ({}, b'not an image at all', uploadhandlers.NOT_AN_IMAGE),
+            ({'UPLOAD_MAX_SIZE': 100}, self.make_jpeg(),
+             uploadhandlers.TOO_LARGE),
+            ({'UPLOAD_MAX_IMAGE_PIXELS': 100}, self.make_jpeg(),
+             uploadhandlers.TOO_MANY_PIXELS),
+        ]
+        for limits, content, error in cases:
+            with self.subTest(error=error), override_settings(**limits):
+                response = self.upload(content)
+                self.assertFormError(response, 'form', 'image', error)
+        self.assertFalse(Post.objects.exists())
+
+    def test_size_limit_counts_only_file(self):
+        """Проверяем, что лимит размера относится к файлу, а не ко всему
+        запросу с длинным текстом записи."""
+        content = self.make_jpeg()
+        with override_settings(UPLOAD_MAX_SIZE=len(content)):
+            self.authorized_client.post(POST_CREATE_URL, data={
+                'text': 'Длинный текст. ' * 10000,
+                'image': SimpleUploadedFile(
+                    'photo.jpg', content, 'image/jpeg'
+                ),
+            })
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    def test_csrf_checked(self):
+        """Проверяем, что форма записи по-прежнему требует CSRF-токен."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(POST_CREATE_URL, data={'text': 'Без токена'})
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testAuthorized')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, name):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+        self.authorized_client.post(POST_CREATE_URL, data={
+            'text': f'Запись с картинкой {name}',
+            'image': SimpleUploadedFile(name, buffer.getvalue(), 'image/png'),
+        })
+        return Post.objects.get(text=f'Запись с картинкой {name}')
+
+    def test_identical_images_stored_once(self):
+        """Проверяем, что одинаковые картинки хранятся одним файлом,
+        который удаляется вместе с последней ссылкой на него."""
+        first = self.upload('first.png')
+        second = self.upload('second.png')
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(StoredImage.objects.get(name=name).references, 2)
+        first.delete()
+        self.assertTrue(second.image.storage.exists(name))
+        self.assertEqual(StoredImage.objects.get(name=name).references, 1)
+        second.delete()
+        self.assertFalse(second.image.storage.exists(name))
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_thumbnail_reused(self):
+        """Проверяем, что для повторно загруженной картинки
+        используется уже построенная миниатюра."""
+        first = self.upload('first.png')
+        thumbnails.run(ThumbnailJob.objects.get(post=first).pk)
+        second = self.upload('second.png')
+        self.assertFalse(ThumbnailJob.objects.filter(post=second).exists())
+        self.assertEqual(
+            thumbnails.image_for(second).url, thumbnails.image_for(first).url
+        )
@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
 from posts.models import Group, Post, User, Comment, Follow
@@ -131,3 +134,69 @@ class PostModelTest(TestCase):
         comment = PostModelTest.comment
         help_text = comment._meta.get_field('text').help_text
         self.assertEqual(help_text, 'Пожалуйста, оставьте Ваш комментарий')
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тест-группа',
+            slug='Тест-слаг',
+            description='Тест-описание',
+        )
+        cls.group2 = Group.objects.create(
+            title='Тест-группа2',
+            slug='Тест-слаг2',
+            description='Тест-описание2',
+        )
+
+    def counters(self):
+        self.user.profile.refresh_from_db()
+        self.author.profile.refresh_from_db()
+        self.group.refresh_from_db()
+        self.group2.refresh_from_db()
+        return (
+            self.author.profile.posts_count,
+            self.author.profile.followers_count,
+            self.user.profile.following_count,
+            self.group.posts_count,
+            self.group2.posts_count,
+        )
+
+    def test_counters_follow_changes(self):
+        """Проверяем, что счётчики меняются вместе с данными."""
+        post = Post.objects.create(
+            author=self.author, text='Тест-пост', group=self.group
+        )
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Тест-комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counters(), (1, 1, 1, 1, 0))
+        post.group = self.group2
+        post.save()
+        self.assertEqual(self.counters(), (1, 1, 1, 0, 1))
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 0))
+
+    def test_recount_repairs_drift(self):
+        """Проверяем, что recount исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Тест-пост', group=self.group)
+            for _ in range(3)
+        )
+        Follow.objects.bulk_create([
+            Follow(user=self.user, author=self.author)
+        ])
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 0))
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.counters(), (3, 1, 1, 3, 0))
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+
+INDEX_URL = reverse('posts:index')
+FOLLOW_URL = reverse('posts:follow_index')
+
+
+class ViewQueryBudgetTests(TestCase):
+    """Бюджет SQL-запросов страниц не зависит от числа записей
+    и комментариев на них. Ленты тратят один запрос на своё состояние
+    для ETag и ключа кеша страниц."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='testAuthor')
+        cls.reader = User.objects.create_user(username='testReader')
+        cls.group = Group.objects.create(
+            title='Тест-группа',
+            slug='test',
+            description='Тест-описание',
+        )
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=f'{i} большой тест-пост',
+                group=cls.group,
+            )
+        for i in range(5):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'commenter{i}'),
+                text='Тест-комментарий',
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.GROUP_LIST_URL = reverse(
+            'posts:group_list', kwargs={'slug': cls.group.slug}
+        )
+        cls.PROFILE_URL = reverse(
+            'posts:profile', kwargs={'username': cls.author.username}
+        )
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def check_budget(self, client, budgets):
+        for url, budget in budgets:
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                client.get(url)
+
+    def test_guest_query_budget(self):
+        """Бюджет запросов страниц для гостя."""
+        self.check_budget(self.guest_client, [
+            (INDEX_URL, 2),
+            (ViewQueryBudgetTests.GROUP_LIST_URL, 3),
+            (ViewQueryBudgetTests.PROFILE_URL, 3),
+            (ViewQueryBudgetTests.POST_DETAIL_URL, 2),
+        ])
+
+    def test_authorized_query_budget(self):
+        """Бюджет запросов страниц для авторизованного пользователя:
+        плюс сессия и пользователь."""
+        self.check_budget(self.reader_client, [
+            (INDEX_URL, 4),
+            (ViewQueryBudgetTests.GROUP_LIST_URL, 5),
+            (ViewQueryBudgetTests.PROFILE_URL, 6),
+            (ViewQueryBudgetTests.POST_DETAIL_URL, 4),
+            (FOLLOW_URL, 5),
+        ])
@@ -1,15 +1,28 @@
 import shutil
 import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from urllib.parse import urlencode
 
 from django import forms
 from django.conf import settings
 from http import HTTPStatus
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
+from django.utils import timezone
+from posts.counters import recount
+from posts import search, thumbnails
 from posts.forms import PostForm
-from posts.models import Group, Post, User, Follow, Comment
+from posts.models import (
+    Group, Post, Profile, User, Follow, Comment, ThumbnailJob,
+    TimelineEntry
+)
 from posts.views import POSTS_PER_PAGE
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -25,7 +38,7 @@ SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
              )
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -211,22 +224,110 @@ class PostViewsTests(TestCase):
         self.assertIsInstance(group, Group)
         self.assertEqual(group, self.group2)
 
+    def test_thumbnail_built_in_background(self):
+        """Проверяем, что миниатюра строится заданием из очереди,
+        а до этого страница показывает исходную картинку."""
+        response = PostViewsTests.author_client.get(
+            PostViewsTests.POST_DETAIL_URL
+        )
+        self.assertContains(response, PostViewsTests.post.image.url)
+        job = ThumbnailJob.objects.get(post=PostViewsTests.post)
+        thumbnails.run(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ThumbnailJob.DONE)
+        thumbnail = thumbnails.get_existing(PostViewsTests.post.image)
+        self.assertIsNotNone(thumbnail)
+        response = PostViewsTests.author_client.get(
+            PostViewsTests.POST_DETAIL_URL
+        )
+        self.assertContains(response, thumbnail.url)
+
+    def test_requeue_stale_by_claim_time(self):
+        """Проверяем, что в очередь возвращаются только задания,
+        которые выполняются слишком долго, а не давно поставленные."""
+        job = ThumbnailJob.objects.get(post=PostViewsTests.post)
+        long_ago = timezone.now() - timedelta(hours=1)
+        ThumbnailJob.objects.filter(pk=job.pk).update(
+            created=long_ago, status=ThumbnailJob.RUNNING,
+            claimed_at=timezone.now()
+        )
+        self.assertEqual(thumbnails.requeue_stale(timedelta(minutes=10)), 0)
+        ThumbnailJob.objects.filter(pk=job.pk).update(claimed_at=long_ago)
+        self.assertEqual(thumbnails.requeue_stale(timedelta(minutes=10)), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ThumbnailJob.PENDING)
+
     def test_index_cache(self):
-        """Проверяем, что кеширование главной страницы работает."""
+        """Проверяем, что карточка записи берётся из кеша,
+        пока запись не изменилась."""
         new_post = Post.objects.create(
             text='Комментарий проверки кэша',
             author=PostViewsTests.author,
             group=PostViewsTests.group,
         )
-        current_content = PostViewsTests.author_client.get(INDEX_URL).content
+        PostViewsTests.author_client.get(INDEX_URL)
+        Post.objects.filter(pk=new_post.pk).update(text='Изменён в обход')
+        response = PostViewsTests.author_client.get(INDEX_URL)
+        self.assertContains(response, 'Комментарий проверки кэша')
+        new_post.text = 'Отредактированная запись'
+        new_post.save()
+        response = PostViewsTests.author_client.get(INDEX_URL)
+        self.assertContains(response, 'Отредактированная запись')
+        self.assertNotContains(response, 'Комментарий проверки кэша')
         new_post.delete()
-        after_delete_post_content = PostViewsTests.author_client.get(
-            INDEX_URL).content
-        self.assertEqual(current_content, after_delete_post_content)
+        response = PostViewsTests.author_client.get(INDEX_URL)
+        self.assertNotContains(response, 'Отредактированная запись')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=1)
+class ThumbnailDrainTests(TransactionTestCase):
+    """Потоки пула видят только зафиксированные данные, поэтому
+    TransactionTestCase."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
         cache.clear()
-        after_delete_post_content = PostViewsTests.author_client.get(
-            INDEX_URL).content
-        self.assertNotEqual(current_content, after_delete_post_content)
+        author = User.objects.create(username='testAuthor')
+        with override_settings(THUMBNAIL_WORKERS=0):
+            self.posts = [
+                Post.objects.create(
+                    author=author, text=f'Тест-пост {i}',
+                    image=SimpleUploadedFile(
+                        name='small.gif', content=SMALL_GIF,
+                        content_type='image/gif',
+                    )
+                )
+                for i in range(2)
+            ]
+
+    def tearDown(self):
+        if thumbnails._executor is not None:
+            thumbnails._executor.shutdown(wait=True)
+            thumbnails._executor = None
+
+    def test_feed_drains_queue(self):
+        """Проверяем, что страница с исходной картинкой запускает
+        задания, оставшиеся в очереди, и брошенные упавшим процессом."""
+        ThumbnailJob.objects.filter(post=self.posts[0]).update(
+            status=ThumbnailJob.RUNNING,
+            claimed_at=timezone.now() - timedelta(
+                seconds=settings.THUMBNAIL_STALE_TIMEOUT + 1
+            )
+        )
+        self.client.get(INDEX_URL)
+        deadline = time.monotonic() + 10
+        while ThumbnailJob.objects.exclude(
+            status=ThumbnailJob.DONE
+        ).exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(
+            set(ThumbnailJob.objects.values_list('status', flat=True)),
+            {ThumbnailJob.DONE}
+        )
 
 
 class PostPaginatorTests(TestCase):
@@ -254,11 +355,14 @@ class PostPaginatorTests(TestCase):
             )
             for i in range(POSTS_PER_PAGE + cls.ADDPOSTS)
         )
+        recount()
 
     def setUp(self):
+        cache.clear()
         self.author_client = Client()
         self.author_client.force_login(self.author)
 
+    @override_settings(POSTS_PAGINATION='page')
     def test_accordance_posts_per_pages(self):
         """Проверяем, что количество постов
         на первой странице равно 10, а на второй - 5"""
@@ -282,6 +386,91 @@ class PostPaginatorTests(TestCase):
                     PostPaginatorTests.ADDPOSTS
                 )
 
+    def test_cursor_pagination(self):
+        """Проверяем, что курсоры ведут на следующую и предыдущую
+        страницы без пропусков и повторов."""
+        for url in [
+            INDEX_URL,
+            PostPaginatorTests.GROUP_LIST_URL,
+            PostPaginatorTests.PROFILE_URL
+        ]:
+            with self.subTest(url=url):
+                first_page = self.author_client.get(url).context['page_obj']
+                self.assertEqual(len(first_page), POSTS_PER_PAGE)
+                self.assertIsNone(first_page.previous_cursor)
+                second_page = self.author_client.get(
+                    url, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    len(second_page), PostPaginatorTests.ADDPOSTS
+                )
+                self.assertIsNone(second_page.next_cursor)
+                self.assertCountEqual(
+                    list(first_page) + list(second_page),
+                    Post.objects.all()
+                )
+                back_page = self.author_client.get(
+                    url, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+
+    def test_cursor_pagination_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.author_client.get(INDEX_URL, {'cursor': '%%%'})
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+
+    @override_settings(
+        POSTS_PAGINATION='page', POSTS_PER_PAGE=1, PAGINATOR_ON_EACH_SIDE=1
+    )
+    def test_page_range_window(self):
+        """Проверяем, что навигация показывает первую, последнюю
+        и соседние с текущей страницы, а остальные пропускает."""
+        response = self.author_client.get(INDEX_URL, {'page': 8})
+        shown = [f'page={number}"' for number in (1, 7, 9, 15)]
+        hidden = [f'page={number}"' for number in (2, 6, 10, 14)]
+        for link in shown:
+            with self.subTest(link=link):
+                self.assertContains(response, link)
+        for link in hidden:
+            with self.subTest(link=link):
+                self.assertNotContains(response, link)
+        self.assertContains(response, '&hellip;', count=2)
+
+    @override_settings(POSTS_PAGINATION='page')
+    def test_index_count_cached(self):
+        """Проверяем, что число записей ленты считается один раз
+        на версию ленты: следующая страница - запрос состояния ленты и
+        запрос записей."""
+        first_page = self.client.get(INDEX_URL).context['page_obj']
+        self.assertEqual(first_page.paginator.count, len(self.posts))
+        self.assertFalse(first_page.paginator.approximate)
+        with self.assertNumQueries(2):
+            response = self.client.get(INDEX_URL, {'page': 2})
+        self.assertEqual(
+            response.context['page_obj'].paginator.count, len(self.posts)
+        )
+
+    @override_settings(
+        POSTS_PAGINATION='page', APPROXIMATE_COUNT_THRESHOLD=10,
+        COUNT_REFRESH_WORKERS=0
+    )
+    def test_index_approximate_count(self):
+        """Проверяем, что для длинной ленты число записей берётся
+        из оценки или кеша, помечается приблизительным и пересчитывается,
+        когда устарело."""
+        page_obj = self.client.get(INDEX_URL).context['page_obj']
+        self.assertTrue(page_obj.paginator.approximate)
+        self.assertGreaterEqual(page_obj.paginator.count, len(self.posts))
+        self.assertEqual(cache.get('count:feed:index')[0], len(self.posts))
+        cache.set('count:feed:index', (1000, time.time()))
+        response = self.client.get(INDEX_URL, {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 1000)
+        self.assertContains(response, '>~100<')
+        self.assertEqual(cache.get('count:feed:index')[0], 1000)
+        cache.set('count:feed:index', (1000, 0))
+        self.client.get(INDEX_URL, {'page': 3})
+        self.assertEqual(cache.get('count:feed:index')[0], len(self.posts))
+
 
 class FollowViewsTests(TestCase):
     @classmethod
@@ -381,3 +570,282 @@ class FollowViewsTests(TestCase):
         response = self.authorized_client.get(FOLLOW_URL)
         self.assertEqual(len(response.context['page_obj']), 0)
         self.assertNotContains(response, FollowViewsTests.post)
+
+    def test_timeline_fan_out(self):
+        """Проверяем, что записи раскладываются по лентам подписчиков
+        и убираются из них при отписке."""
+        Follow.objects.create(user=self.user, author=FollowViewsTests.author)
+        new_post = Post.objects.create(
+            author=FollowViewsTests.author, text='Новый тест-пост'
+        )
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.user
+            ).values_list('post', flat=True)),
+            [new_post.pk, FollowViewsTests.post.pk]
+        )
+        self.authorized_client.post(FollowViewsTests.PROFILE_UNFOLLOW_URL)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_timeline_fan_out_on_read(self):
+        """Проверяем, что записи авторов без раскладки
+        подмешиваются в ленту при чтении."""
+        cache.clear()
+        Follow.objects.create(user=self.user, author=FollowViewsTests.author)
+        new_post = Post.objects.create(
+            author=FollowViewsTests.author, text='Пост без раскладки'
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists()
+        )
+        response = self.authorized_client.get(FOLLOW_URL)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [new_post, FollowViewsTests.post]
+        )
+        cache.clear()
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2,
+                       TIMELINE_FANOUT_RESUME_LIMIT=1)
+    def test_timeline_backfill_when_author_leaves_celebrities(self):
+        """Проверяем, что раскладка возобновляется только ниже нижнего
+        предела, а записи, опубликованные без неё, переносит в ленты
+        задача backfill, до которой они подмешиваются при чтении."""
+        cache.clear()
+        others = [
+            User.objects.create_user(username=f'testOther{i}')
+            for i in range(2)
+        ]
+        for user in (self.user, *others):
+            Follow.objects.create(user=user, author=FollowViewsTests.author)
+        new_post = Post.objects.create(
+            author=FollowViewsTests.author, text='Пост без раскладки'
+        )
+        # Записи до выключения раскладки задача не трогает.
+        TimelineEntry.objects.filter(post=FollowViewsTests.post).delete()
+        for user, celebrity in zip(others, (True, False)):
+            Follow.objects.filter(user=user).delete()
+            profile = Profile.objects.get(user=FollowViewsTests.author)
+            self.assertEqual(profile.celebrity, celebrity)
+            self.assertIsNotNone(profile.celebrity_since)
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.authorized_client.get(FOLLOW_URL)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [new_post, FollowViewsTests.post]
+        )
+        call_command('backfill', 'celebrity_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.user.pk, new_post.pk)]
+        )
+        self.assertIsNone(Profile.objects.get(
+            user=FollowViewsTests.author
+        ).celebrity_since)
+        cache.clear()
+
+
+class SearchViewsTests(TestCase):
+    SEARCH_URL = reverse('posts:search')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='testAuthor')
+        cls.best = Post.objects.create(
+            author=cls.author, text='Ёжик ёжик ёжик в тумане'
+        )
+        cls.other = Post.objects.create(
+            author=cls.author, text='Ежик заблудился в тумане'
+        )
+        cls.unrelated = Post.objects.create(
+            author=cls.author, text='Лошадка у реки'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        return self.client.get(
+            SearchViewsTests.SEARCH_URL, {'q': query, **params}
+        )
+
+    def check_ranking(self):
+        response = self.search('ежики')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [SearchViewsTests.best, SearchViewsTests.other]
+        )
+        response = self.search('ТУМАНАХ заблудилась')
+        self.assertEqual(
+            list(response.context['page_obj']), [SearchViewsTests.other]
+        )
+        self.assertFalse(self.search('').context['page_obj'])
+
+    def test_search_ranked(self):
+        """Проверяем, что поиск находит записи со всеми словами
+        запроса и ставит выше более релевантные."""
+        self.check_ranking()
+
+    @override_settings(SEARCH_BACKEND='terms')
+    def test_search_without_fts(self):
+        """Проверяем поиск по таблице слов без FTS5."""
+        search.rebuild()
+        self.check_ranking()
+
+    def test_search_index_follows_changes(self):
+        """Проверяем, что индекс обновляется при изменении
+        и удалении записи."""
+        post = SearchViewsTests.unrelated
+        post.text = 'Ёжик у реки'
+        post.save()
+        self.assertIn(post, self.search('ежик').context['page_obj'])
+        post.delete()
+        self.assertNotIn(post, self.search('ежик').context['page_obj'])
+
+    def test_search_pagination(self):
+        """Проверяем, что ссылки на страницы результатов
+        сохраняют запрос."""
+        for i in range(POSTS_PER_PAGE + 2):
+            Post.objects.create(author=SearchViewsTests.author,
+                                text=f'Пост номер {i}')
+        response = self.search('номер')
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+        self.assertContains(
+            response, f'href="?{urlencode({"q": "номер"})}&amp;page=2"'
+        )
+        response = self.search('номер', page=2)
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='testAuthor')
+        cls.reader = User.objects.create(username='testReader')
+        cls.group = Group.objects.create(
+            title='Тест-группа',
+            slug='test-slug',
+            description='Тест-описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тест-пост',
+            group=cls.group,
+        )
+        cls.urls = [
+            INDEX_URL,
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+
+    def revalidate(self, url, client=None):
+        client = client or self.reader_client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        """Проверяем, что неизменённая страница отдаётся ответом 304
+        без шаблона."""
+        for url in ConditionalGetTests.urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertFalse(response.templates)
+
+    def test_modified_after_changes(self):
+        """Проверяем, что новая запись, комментарий и подписка
+        меняют ETag своих страниц."""
+        etags = {
+            url: self.reader_client.get(url)['ETag']
+            for url in ConditionalGetTests.urls
+        }
+        Post.objects.create(author=ConditionalGetTests.author,
+                            text='Новый пост', group=ConditionalGetTests.group)
+        Comment.objects.create(post=ConditionalGetTests.post,
+                               author=ConditionalGetTests.reader,
+                               text='Комментарий')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        profile_url = ConditionalGetTests.urls[2]
+        etag = self.reader_client.get(profile_url)['ETag']
+        Follow.objects.create(user=ConditionalGetTests.reader,
+                              author=ConditionalGetTests.author)
+        response = self.reader_client.get(
+            profile_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_modified_after_rename(self):
+        """Проверяем, что смена имени автора меняет ETag лент."""
+        etags = {
+            url: self.reader_client.get(url)['ETag']
+            for url in ConditionalGetTests.urls[:3]
+        }
+        author = User.objects.get(pk=ConditionalGetTests.author.pk)
+        author.first_name = 'Новое имя'
+        author.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertContains(response, 'Новое имя')
+
+    def test_modified_without_version_bump(self):
+        """Проверяем, что изменение записи, о котором кеш процесса не
+        знает, меняет ETag и страницу ленты."""
+        etags = {
+            url: self.reader_client.get(url)['ETag']
+            for url in ConditionalGetTests.urls[:3]
+        }
+        Post.objects.filter(pk=ConditionalGetTests.post.pk).update(
+            text='Изменённый пост', updated=timezone.now()
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertContains(response, 'Изменённый пост')
+
+    def test_etag_depends_on_user(self):
+        """Проверяем, что ETag одного пользователя не подходит другому."""
+        url = ConditionalGetTests.urls[0]
+        etag = self.reader_client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            HTTPStatus.OK
+        )
+
+    def test_post_detail_last_modified(self):
+        """Проверяем ответ 304 на If-Modified-Since для страницы записи."""
+        url = ConditionalGetTests.urls[3]
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_missing_objects(self):
+        """Проверяем, что для несуществующих объектов по-прежнему 404."""
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
@@ -0,0 +1,187 @@
+"""Фоновое построение миниатюр картинок записей.
+
+Сохранение записи с новой картинкой ставит ThumbnailJob в очередь в базе.
+Задание выполняет пул потоков процесса (THUMBNAIL_WORKERS) или отдельный
+процесс manage.py thumbnails, поэтому внешний брокер не нужен. Пул при
+запуске и затем не чаще раза в THUMBNAIL_DRAIN_INTERVAL, когда страница
+показывает исходную картинку вместо миниатюры, забирает и задания,
+оставшиеся в очереди после перезапуска или брошенные упавшим процессом.
+Шаблоны только ищут готовую миниатюру в хранилище ключей sorl и, пока
+её нет, показывают исходную картинку, а не декодируют её при отрисовке.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .models import ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+MAX_ATTEMPTS = 3
+
+_executor = None
+
+
+class LookupBackend(ThumbnailBackend):
+    """Бэкенд sorl, который только ищет готовую миниатюру.
+
+    Имя миниатюры вычисляется так же, как в ThumbnailBackend.get_thumbnail,
+    но без чтения исходного файла.
+    """
+
+    def get_existing(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+lookup_backend = LookupBackend()
+
+
+def get_existing(image):
+    """Готовая миниатюра картинки или None, если её ещё нет."""
+    return lookup_backend.get_existing(image, GEOMETRY, **OPTIONS)
+
+
+def enqueue(post):
+    """Ставит построение миниатюры картинки записи в очередь.
+
+    Для картинки, уже загруженной с другой записью, миниатюра есть
+    в хранилище, и задание не нужно.
+    """
+    if get_existing(post.image) is not None:
+        return None
+    job = ThumbnailJob.objects.create(post=post, image=post.image.name)
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: _submit(job.pk))
+    return job
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+        _executor.submit(_drain_in_thread)
+    return _executor
+
+
+def _submit(job_id):
+    _get_executor().submit(_run_in_thread, job_id)
+
+
+def drain():
+    """Отдаёт пулу потоков задания, оставшиеся в очереди, не чаще раза
+    в THUMBNAIL_DRAIN_INTERVAL секунд."""
+    if not settings.THUMBNAIL_WORKERS or not cache.add(
+        'thumbnails:drain', True, settings.THUMBNAIL_DRAIN_INTERVAL
+    ):
+        return
+    if _executor is None:
+        _get_executor()
+    else:
+        _executor.submit(_drain_in_thread)
+
+
+def _drain_in_thread():
+    close_old_connections()
+    try:
+        requeue_stale(timedelta(seconds=settings.THUMBNAIL_STALE_TIMEOUT))
+        for job_id in ThumbnailJob.objects.filter(
+            status=ThumbnailJob.PENDING
+        ).values_list('pk', flat=True):
+            _executor.submit(_run_in_thread, job_id)
+    except Exception:
+        logger.exception('Разбор очереди миниатюр не удался')
+    finally:
+        close_old_connections()
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run(job_id)
+    except Exception:
+        logger.exception('Задание на миниатюру %s завершилось ошибкой', job_id)
+    finally:
+        close_old_connections()
+
+
+def run(job_id):
+    """Выполняет задание, если его ещё не забрал другой исполнитель."""
+    claimed = ThumbnailJob.objects.filter(
+        pk=job_id, status=ThumbnailJob.PENDING
+    ).update(status=ThumbnailJob.RUNNING, claimed_at=timezone.now())
+    if not claimed:
+        return
+    job = ThumbnailJob.objects.select_related('post').get(pk=job_id)
+    post = job.post
+    if post.image.name != job.image:
+        job.status = ThumbnailJob.DONE
+    else:
+        default.backend.get_thumbnail(post.image, GEOMETRY, **OPTIONS)
+        if get_existing(post.image) is not None:
+            job.status = ThumbnailJob.DONE
+            # Новая версия записи меняет ключ её закешированной карточки.
+            post.save(update_fields=['updated'])
+        else:
+            job.attempts += 1
+            job.status = (
+                ThumbnailJob.FAILED if job.attempts >= MAX_ATTEMPTS
+                else ThumbnailJob.PENDING
+            )
+    job.save(update_fields=['status', 'attempts'])
+
+
+def run_pending(limit=None):
+    """Выполняет задания из очереди, возвращает их число."""
+    jobs = ThumbnailJob.objects.filter(
+        status=ThumbnailJob.PENDING
+    ).values_list('pk', flat=True)
+    done = 0
+    for job_id in list(jobs[:limit] if limit else jobs):
+        run(job_id)
+        done += 1
+    return done
+
+
+def requeue_stale(older_than):
+    """Возвращает в очередь задания, брошенные упавшим исполнителем:
+    выполняющиеся дольше older_than с момента, как их забрали."""
+    return ThumbnailJob.objects.filter(
+        status=ThumbnailJob.RUNNING,
+        claimed_at__lt=timezone.now() - older_than
+    ).update(status=ThumbnailJob.PENDING)
+
+
+def image_for(post):
+    """Миниатюра картинки записи, а пока её нет - исходная картинка."""
+    if not post.image:
+        return None
+    thumbnail = get_existing(post.image)
+    if thumbnail is None:
+        drain()
+        return post.image
+    return thumbnail
@@ -0,0 +1,199 @@
+"""Материализованные ленты подписок (fan-out-on-write).
+
+Новая запись автора раскладывается в TimelineEntry каждого подписчика,
+поэтому страница ленты читается одним диапазоном индекса
+(user, -pub_date, -post). Записи авторов, у которых подписчиков больше
+TIMELINE_FANOUT_LIMIT, не раскладываются, а подмешиваются при чтении;
+Profile.celebrity_since помнит, с какого момента. Раскладка
+возобновляется, когда подписчиков становится не больше
+TIMELINE_FANOUT_RESUME_LIMIT, а записи, опубликованные без неё, переносит
+в ленты задача manage.py backfill celebrity_timelines. До её завершения
+записи автора по-прежнему подмешиваются при чтении.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import DateTimeField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import follows
+from .models import Follow, Post, Profile, TimelineEntry
+from .paginators import KeysetPaginator
+
+CELEBRITIES_CACHE_TIMEOUT = 300
+FANOUT_BATCH_SIZE = 500
+
+
+def _celebrities_key():
+    return f'timeline:celebrities:{settings.TIMELINE_FANOUT_LIMIT}'
+
+
+def _celebrities():
+    return Profile.objects.filter(celebrity_since__isnull=False)
+
+
+def celebrity_ids():
+    """Авторы, записи которых могут отсутствовать в лентах и
+    подмешиваются при чтении.
+
+    Набор кешируется и нужен только при чтении: лишний автор в нём
+    даёт повторы, которые отбрасывает TimelinePaginator.
+    """
+    ids = cache.get(_celebrities_key())
+    if ids is None:
+        ids = set(_celebrities().values_list('user_id', flat=True))
+        cache.set(_celebrities_key(), ids, CELEBRITIES_CACHE_TIMEOUT)
+    return ids
+
+
+def is_celebrity(author_id):
+    """Выключена ли раскладка записей автора. Проверка по базе:
+    раскладка не должна зависеть от устаревшего кеша, иначе записи
+    пропадут из лент."""
+    return Profile.objects.filter(user_id=author_id, celebrity=True).exists()
+
+
+def _add_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Кладёт новую запись в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    _add_entries(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user', flat=True).iterator()
+    )
+
+
+def follow(user_id, author_id):
+    """Переносит записи автора в ленту нового подписчика.
+
+    Переносятся и записи авторов без раскладки, поэтому после её
+    возобновления догонять нужно только записи с celebrity_since.
+    """
+    _add_entries(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in Post.objects.filter(
+            author_id=author_id
+        ).values_list('pk', 'pub_date').iterator()
+    )
+
+
+def followers_changed(author_id, delta):
+    """Выключает раскладку записей author_id, когда число его подписчиков,
+    выросшее на delta, превышает TIMELINE_FANOUT_LIMIT, и включает, когда
+    после отписки оно не больше TIMELINE_FANOUT_RESUME_LIMIT.
+
+    Повторное превышение до переноса записей сохраняет прежнюю
+    celebrity_since, так что задача перенесёт их все.
+    """
+    profiles = Profile.objects.filter(user=author_id)
+    if delta > 0:
+        if profiles.filter(
+            celebrity=False,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).update(celebrity=True, celebrity_since=Coalesce(
+            'celebrity_since',
+            Value(timezone.now(), output_field=DateTimeField())
+        )):
+            cache.delete(_celebrities_key())
+    else:
+        profiles.filter(
+            celebrity=True,
+            followers_count__lte=settings.TIMELINE_FANOUT_RESUME_LIMIT
+        ).update(celebrity=False)
+
+
+def backfill_author(author_id, since):
+    """Раскладывает записи автора, опубликованные начиная с since, по
+    лентам его подписчиков и, если раскладка за это время не выключилась
+    снова, убирает автора из подмешиваемых при чтении."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            'WHERE f.author_id = %s AND p.pub_date >= %s '
+            'ON CONFLICT DO NOTHING',
+            [author_id, connection.ops.adapt_datetimefield_value(since)]
+        )
+    if Profile.objects.filter(
+        user=author_id, celebrity=False, celebrity_since=since
+    ).update(celebrity_since=None):
+        cache.delete(_celebrities_key())
+
+
+def unfollow(user_id, author_id):
+    """Убирает записи автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Пересобирает ленту пользователя по текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    for author_id in Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author', flat=True):
+        follow(user_id, author_id)
+
+
+def following_posts(user):
+    """Лента подписок, собранная при чтении (fan-out-on-read)."""
+    return Post.objects.select_related('author', 'group').filter(
+        author__following__user=user
+    )
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Пагинатор ленты подписок поверх TimelineEntry.
+
+    Ключи страницы берутся диапазоном из ленты пользователя и, если он
+    подписан на авторов без раскладки, сливаются с их записями.
+    """
+
+    def __init__(self, user, per_page):
+        self.user = user
+        self.celebrity_ids = [
+            author_id for author_id in celebrity_ids()
+            if follows.is_following(user.pk, author_id)
+        ]
+        super().__init__(following_posts(user), per_page)
+
+    def _slice(self, key, descending):
+        limit = self.per_page + 1
+        keys = list(self.ordered(
+            TimelineEntry.objects.filter(user=self.user),
+            key, descending, pk='post_id'
+        ).values_list('pub_date', 'post_id')[:limit])
+        if self.celebrity_ids:
+            keys += self.ordered(
+                Post.objects.filter(author_id__in=self.celebrity_ids),
+                key, descending
+            ).values_list('pub_date', 'pk')[:limit]
+            keys = sorted(set(keys), reverse=descending)[:limit]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for _, pk in keys[:self.per_page]]
+        )
+        return (
+            [posts[pk] for _, pk in keys[:self.per_page] if pk in posts],
+            len(keys) > self.per_page
+        )
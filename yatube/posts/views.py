@@ -1,64 +1,156 @@
+from hashlib import md5
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
 from django.shortcuts import render, get_object_or_404, redirect
+from django.views.decorators.http import condition
+
+from core.cache import get_or_set
+from core.replicas import read_replica
+from core.sqlite import retry_on_locked
 
+from . import conditional, follows
+from .counters import get_profile
 from .forms import CommentForm, PostForm
-from .models import Post, Group, User, Follow
+from .models import Post, User
+from .paginators import (
+    ApproximatePaginator, KeysetPaginator, estimate_rows
+)
+from .search import SearchResults
+from .timeline import TimelinePaginator, following_posts
+from .uploadhandlers import image_uploads
 
 POSTS_PER_PAGE = 10
 
 
-def paginator(request, post_list):
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def paginator(request, post_list, count=None, feed=None, estimate=None):
+    if settings.POSTS_PAGINATION == 'cursor':
+        paginator = KeysetPaginator(post_list, settings.POSTS_PER_PAGE)
+        page_number = request.GET.get('cursor')
+    elif feed is not None and count is None:
+        paginator = ApproximatePaginator(
+            post_list, settings.POSTS_PER_PAGE, feed, estimate
+        )
+        page_number = request.GET.get('page')
+    else:
+        paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
+        page_number = request.GET.get('page')
+    if count is not None:
+        paginator.count = count
+    if feed is None:
+        return paginator.get_page(page_number)
+    return cached_page(
+        paginator, page_number, feed,
+        conditional.feed_state(request, feed, post_list)
+    )
+
+
+def cached_page(paginator, page_number, feed, state):
+    """Страница ленты feed из общего кеша.
+
+    Ключ включает состояние ленты из conditional.feed_state, которое
+    меняется вместе с её записями, а промах по ключу под нагрузкой даёт
+    один запрос к базе.
+    """
+    def load():
+        page = paginator.get_page(page_number)
+        return (
+            list(page), page.number,
+            getattr(page, 'next_cursor', None),
+            getattr(page, 'previous_cursor', None),
+        )
+
+    page_hash = md5(str(page_number).encode()).hexdigest()
+    posts, number, next_cursor, previous_cursor = get_or_set(
+        f'{feed}:{state}:{settings.POSTS_PAGINATION}:{page_hash}',
+        load, settings.FEED_CACHE_TIMEOUT
+    )
+    page = Page(posts, number, paginator)
+    if getattr(paginator, 'keyset', False):
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+    return page
 
 
+@read_replica
+@condition(etag_func=conditional.index_etag)
 def index(request):
     return render(
         request, 'posts/index.html',
         {'page_obj': paginator(
-            request, Post.objects.select_related('author', 'group').all())
+            request, Post.objects.select_related('author', 'group').all(),
+            feed='feed:index', estimate=lambda: estimate_rows(Post))
          }
     )
 
 
+@read_replica
+@condition(etag_func=conditional.group_etag)
 def group_posts(request, slug):
+    group = conditional.get_group(request, slug)
+    page_obj = paginator(
+        request, group.posts.select_related('author'),
+        count=group.posts_count, feed=f'feed:group:{group.pk}'
+    )
     return render(
         request, 'posts/group_list.html',
-        {'group': get_object_or_404(Group, slug=slug),
-         'page_obj': paginator(
-            request, get_object_or_404(
-                Group, slug=slug).posts.select_related('author').all())
-         }
+        {'group': group, 'page_obj': page_obj}
     )
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = Paginator(
+        SearchResults(query, Post.objects.select_related('author', 'group')),
+        settings.POSTS_PER_PAGE
+    ).get_page(request.GET.get('page'))
+    return render(
+        request, 'posts/search.html',
+        {'query': query,
+         'page_obj': page_obj,
+         'query_params': urlencode({'q': query}) + '&'}
+    )
+
+
+@read_replica
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
+    author = conditional.get_author(request, username)
+    author_profile = get_profile(author)
+    page_obj = paginator(
+        request, author.posts.select_related('group'),
+        count=author_profile.posts_count
+    )
+    following = request.user.is_authenticated and (
+        follows.is_following(request.user.pk, author.pk)
+    )
     return render(
         request, 'posts/profile.html',
-        {'author': get_object_or_404(User, username=username),
-         'page_obj': paginator(
-            request, get_object_or_404(
-                User, username=username).posts.select_related('group').all()),
-         'following': request.user.is_authenticated and (
-            request.user.follower.filter(user=request.user).exists())
-         }
+        {'author': author,
+         'author_profile': author_profile,
+         'page_obj': page_obj,
+         'following': following}
     )
 
 
+@read_replica
+@condition(etag_func=conditional.post_detail_etag,
+           last_modified_func=conditional.post_detail_last_modified)
 def post_detail(request, post_id):
+    post = conditional.get_post(request, post_id)
     return render(
         request, 'posts/post_detail.html',
-        {'post': get_object_or_404(Post, pk=post_id),
+        {'post': post,
          'form': CommentForm(),
-         'comments': get_object_or_404(Post, pk=post_id).comments.all()
+         'comments': post.comments.select_related('author')
          }
     )
 
 
 @login_required
+@image_uploads
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -73,6 +165,7 @@ def post_create(request):
 
 
 @login_required
+@image_uploads
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = PostForm(
@@ -93,6 +186,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@retry_on_locked
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -104,26 +198,29 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_replica
 @login_required
 def follow_index(request):
-    return render(
-        request, 'posts/follow.html',
-        {'page_obj': paginator(
-            request, Post.objects.filter(author__following__user=request.user))
-         }
-    )
+    if settings.POSTS_PAGINATION == 'cursor':
+        page_obj = TimelinePaginator(
+            request.user, settings.POSTS_PER_PAGE
+        ).get_page(request.GET.get('cursor'))
+    else:
+        page_obj = paginator(request, following_posts(request.user))
+    return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
 @login_required
+@retry_on_locked
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if request.user.username != username:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    follows.follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@retry_on_locked
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    follows.unfollow(request.user, author)
     return redirect('posts:profile', username=username)
@@ -29,7 +29,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -39,13 +41,32 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Каждый шаблон компилируется один раз на процесс, а wsgi.py при старте
+# прогревает шаблоны из DIRS. TEMPLATES_CACHED=False нужен, пока шаблоны
+# правят без перезапуска сервера. TEMPLATE_PROFILING=True при DEBUG
+# замеряет отрисовку каждого шаблона и {% include %} в метриках запроса.
+TEMPLATES_CACHED = os.getenv('TEMPLATES_CACHED', 'True') == 'True'
+TEMPLATE_PROFILING = DEBUG and os.getenv('TEMPLATE_PROFILING') == 'True'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATES_CACHED:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)
+    ]
+if TEMPLATE_PROFILING:
+    TEMPLATE_LOADERS = [
+        ('core.template_loaders.ProfilingLoader', TEMPLATE_LOADERS)
+    ]
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -66,9 +87,39 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
     }
 }
 
+# Выполняются на каждом новом соединении с SQLite (core.sqlite).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Реплики только для чтения: пути к файлам SQLite через запятую в
+# DATABASE_REPLICAS. Ленты читаются с них, записи идут в default, а
+# клиент, который только что писал, REPLICA_STICKY_SECONDS читает
+# с default. Для локальной проверки реплики обновляет
+# manage.py sync_replicas.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,13 +153,87 @@ LOGIN_REDIRECT_URL = 'posts:index'
 
 POSTS_PER_PAGE = 10
 
+# Сколько номеров страниц показывать по сторонам от текущей.
+PAGINATOR_ON_EACH_SIDE = 3
+
+# 'cursor' - пагинация по ключу (pub_date, id), 'page' - нумерованные
+# страницы ?page=N с COUNT(*) и OFFSET.
+POSTS_PAGINATION = 'cursor'
+
+# Записи авторов с большим числом подписчиков не раскладываются по лентам
+# подписок, а подмешиваются при чтении. Раскладка возобновляется, только
+# когда подписчиков становится не больше TIMELINE_FANOUT_RESUME_LIMIT,
+# чтобы подписки и отписки у предела не переключали её каждый раз.
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_FANOUT_RESUME_LIMIT = 9000
+
+# Подписки пользователя в кеше сбрасываются сигналами при изменении,
+# поэтому срок жизни ограничивает только объём кеша.
+FOLLOW_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Поисковый индекс записей: 'fts5' - виртуальная таблица SQLite,
+# 'terms' - таблица слов для других СУБД, 'auto' - по движку базы.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+# Доля запросов, для которых RequestMetricsMiddleware собирает метрики.
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', 0.1)
+)
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+UPLOAD_MAX_IMAGE_PIXELS = 40_000_000
+
+# Версии лент, ETag и подписки сбрасываются через кеш, поэтому при
+# нескольких процессах gunicorn он обязан быть общим: CACHE_BACKEND=
+# memcached (python-memcached) или file. locmem годится только для
+# разработки и тестов, о нём предупреждает check --deploy (core.W001).
+# CACHE_LOCATION - каталог или адрес сервера, например
+# unix:/tmp/memcached.sock.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
     }
 }
+
+FEED_CACHE_TIMEOUT = 60 * 5
+
+# Ленты длиннее APPROXIMATE_COUNT_THRESHOLD записей показывают число
+# страниц по последнему известному или оценённому числу записей, а точный
+# COUNT(*) пересчитывается не чаще раза в COUNT_REFRESH_INTERVAL секунд
+# в COUNT_REFRESH_WORKERS фоновых потоках (0 - сразу в запросе).
+APPROXIMATE_COUNT_THRESHOLD = int(
+    os.getenv('APPROXIMATE_COUNT_THRESHOLD', 100_000)
+)
+COUNT_REFRESH_INTERVAL = 60 * 5
+COUNT_REFRESH_WORKERS = int(os.getenv('COUNT_REFRESH_WORKERS', 1))
+COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько секунд ответы JSON API можно держать в общих кешах.
+API_CACHE_MAX_AGE = 60
+
+# Потоков для построения миниатюр в процессе веб-сервера; при 0 очередь
+# разбирает только manage.py thumbnails. Тесты с временным MEDIA_ROOT
+# выключают потоки, чтобы те не писали в него после ответа.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+# Потоки процесса не чаще раза в THUMBNAIL_DRAIN_INTERVAL секунд забирают
+# задания, оставшиеся в очереди, и возвращают в неё задания, которые
+# выполняются дольше THUMBNAIL_STALE_TIMEOUT секунд.
+THUMBNAIL_DRAIN_INTERVAL = 60
+THUMBNAIL_STALE_TIMEOUT = 60 * 10
+
+# Ключ карточки записи меняется при любом её изменении, поэтому время
+# жизни ограничено только объёмом кеша.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24 * 7